@@ -0,0 +1,51 @@
+"""Benchmark of insurer name matching: a flat alternation of names against the trie
+structured pattern of `InsurerMatcher`, as the dictionary grows.
+
+Usage (from the `backend` directory):
+    python -m benchmarks.bench_insurers --names 10 1000 10000 --repeat 20
+"""
+import argparse
+import random
+import re
+import timeit
+
+from src.insurers import InsurerMatcher
+
+from .bench_parser import make_pages
+
+
+def make_names(n_names: int, seed: int = 0) -> list:
+    """Random insurer names, some of several words."""
+    rng = random.Random(seed)
+    names = set()
+    while len(names) < n_names:
+        name = "".join(rng.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(rng.randint(3, 12)))
+        names.add(name + rng.choice(["", " assurances", " mutuelle", " iard", " vie"]))
+    return sorted(names)
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("--names", type=int, nargs="+", default=[10, 1000, 10000])
+    arg_parser.add_argument("--repeat", type=int, default=20)
+    args = arg_parser.parse_args()
+
+    text = "".join(make_pages(1, lines_per_section=20))
+    print(f"{'names':>6} {'alternation ms/page':>20} {'trie ms/page':>13} {'speedup':>8}")
+    for n_names in args.names:
+        names = make_names(n_names)
+        matcher = InsurerMatcher(names)
+        alternation = re.compile(r"\b(" + "|".join(re.escape(name) for name in names) + r")\b", re.IGNORECASE)
+
+        # names found in the middle of the page
+        for name in (names[len(names) // 2], names[-1]):
+            page = text[:len(text) // 2] + f" {name} " + text[len(text) // 2:]
+            assert matcher.search(page) == alternation.search(page).group(0).upper(), "outputs differ"
+
+        before = timeit.timeit(lambda: alternation.search(text), number=args.repeat) / args.repeat
+        after = timeit.timeit(lambda: matcher.search(text), number=args.repeat) / args.repeat
+        print(f"{n_names:>6} {before * 1e3:>20.3f} {after * 1e3:>13.3f} {before / after:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""Micro-benchmark of section extraction: legacy per-field regex rescans against
+the single-pass segmenter.
+
+Usage (from the `backend` directory):
+    python -m benchmarks.bench_parser --pages 2 4 8 --repeat 50
+"""
+import argparse
+import copy
+import re
+import timeit
+
+from src.parser import regex_field, segmenter
+
+from .corpus import SECTIONS
+
+
+def legacy_parse_field(text: str, starting_field: str) -> str:
+    """`Parser.parse_field` as it was before the segmenter."""
+    match_start = regex_field[starting_field].search(text)
+    remaining_regex = copy.deepcopy(regex_field)
+    del remaining_regex[starting_field]
+    ending_regex = re.compile('|'.join([x.pattern for x in list(remaining_regex.values())]), re.IGNORECASE)
+    matches_end = [(text[x.span()[0]:x.span()[1]], x.span()[0], x.span()[1]) for x in re.finditer(ending_regex, text)]
+    matches_end = sorted(matches_end, key=lambda x: x[1])
+    if not match_start:
+        return ""
+    if not matches_end:
+        return text[match_start.span()[1]:]
+    for match_end in matches_end:
+        if match_start.span()[1] < match_end[1]:
+            return text[match_start.span()[1]:match_end[1]]
+    return text[match_start.span()[1]:]
+
+
+def make_pages(n_pages: int, lines_per_section: int = 6) -> list:
+    """Spread the IPID sections over `n_pages` synthetic page texts."""
+    lines = ["Assurance Habitation", "Produit : Formule Confort"]
+    for header in SECTIONS:
+        lines.append(header)
+        lines.extend(f"- ligne {i} de la section, avec un peu de texte." for i in range(lines_per_section))
+    per_page = -(-len(lines) // n_pages)
+    return ["\n".join(lines[i:i + per_page]) + "\n" for i in range(0, len(lines), per_page)]
+
+
+def legacy_document(pages: list) -> list:
+    return [{field: legacy_parse_field(text, field) for field in regex_field if field != "covered"} for text in pages]
+
+
+def segmenter_document(pages: list) -> list:
+    output = []
+    for text in pages:
+        sections = segmenter.extract(text)
+        del sections["covered"]
+        output.append(sections)
+    return output
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("--pages", type=int, nargs="+", default=[2, 4, 8])
+    arg_parser.add_argument("--repeat", type=int, default=50)
+    args = arg_parser.parse_args()
+
+    print(f"{'pages':>5} {'legacy ms/page':>15} {'segmenter ms/page':>18} {'speedup':>8}")
+    for n_pages in args.pages:
+        pages = make_pages(n_pages)
+        assert legacy_document(pages) == segmenter_document(pages), "outputs differ"
+        legacy = timeit.timeit(lambda: legacy_document(pages), number=args.repeat) / args.repeat / len(pages)
+        new = timeit.timeit(lambda: segmenter_document(pages), number=args.repeat) / args.repeat / len(pages)
+        print(f"{n_pages:>5} {legacy * 1e3:>15.3f} {new * 1e3:>18.3f} {legacy / new:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,213 @@
+"""End-to-end benchmark of the parsing pipeline on a synthetic IPID corpus (see
+`benchmarks.corpus`): throughput, p50/p99 latency and peak memory of
+`pipeline.parse_document` and of each of its stages, for several pipeline options,
+and optionally of the HTTP endpoint under concurrent load.
+
+Results are written as JSON, to be compared with the results of another commit.
+
+Usage (from the `backend` directory):
+    python -m benchmarks.bench_pipeline --documents 50 --output before.json
+    python -m benchmarks.bench_pipeline --documents 50 --http --concurrency 8 --compare before.json
+"""
+import argparse
+import http.client
+import json
+import os
+import platform
+import resource
+import socket
+import subprocess
+import sys
+import time
+import tracemalloc
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+
+from src.pipeline import RULES_VERSION, parse_document
+
+from .corpus import make_corpus
+
+SCENARIOS = {
+    "default": {},
+    "streaming": {"streaming": True},
+    "early_exit": {"early_exit": True},
+    "layout": {"layout": True},
+}
+
+
+def percentile(values: List[float], q: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q / 100 * len(values)))] if values else 0.0
+
+
+def summary(latencies: List[float], seconds: float) -> dict:
+    return {
+        "documents": len(latencies),
+        "docs_per_sec": len(latencies) / seconds if seconds else 0.0,
+        "mean_ms": sum(latencies) / len(latencies) * 1e3 if latencies else 0.0,
+        "p50_ms": percentile(latencies, 50) * 1e3,
+        "p99_ms": percentile(latencies, 99) * 1e3,
+    }
+
+
+def bench_pipeline(documents: List[bytes], repeat: int = 1, **options) -> dict:
+    """Time `parse_document` on each document, and each stage and field from the result metadata.
+    Peak memory of Python allocations is measured in a separate, traced pass."""
+    for content in documents[:3]:  # warm up
+        parse_document(content, **options)
+
+    latencies, stages, fields = [], {}, {}
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for content in documents:
+            document_start = time.perf_counter()
+            ipid = parse_document(content, **options)
+            latencies.append(time.perf_counter() - document_start)
+            for stage, seconds in ipid.metadata.timings.items():
+                stages.setdefault(stage, []).append(seconds)
+            for field, seconds in ipid.metadata.field_timings.items():
+                fields.setdefault(field, []).append(seconds)
+    result = summary(latencies, time.perf_counter() - start)
+
+    tracemalloc.start()
+    peak = 0
+    for content in documents:
+        tracemalloc.reset_peak()
+        parse_document(content, **options)
+        peak = max(peak, tracemalloc.get_traced_memory()[1])
+    tracemalloc.stop()
+
+    result["peak_python_memory_mb"] = peak / 2 ** 20
+    for key, timings in (("stages", stages), ("fields", fields)):
+        result[key] = {name: {"p50_ms": percentile(values, 50) * 1e3, "p99_ms": percentile(values, 99) * 1e3}
+                       for name, values in timings.items()}
+    return result
+
+
+def multipart(filename: str, content: bytes) -> tuple:
+    """Body and content type of a form upload of `content` as the "file" field."""
+    boundary = uuid.uuid4().hex
+    body = (f'--{boundary}\r\nContent-Disposition: form-data; name="file"; filename="{filename}"\r\n'
+            f'Content-Type: application/pdf\r\n\r\n').encode() + content + f"\r\n--{boundary}--\r\n".encode()
+    return body, f"multipart/form-data; boundary={boundary}"
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def bench_http(documents: List[bytes], concurrency: int, repeat: int = 1, mode: str = "process") -> dict:
+    """Post every document to `POST /file` of a server started for the benchmark, with
+    `concurrency` clients. The result cache is disabled, so that every request is parsed."""
+    port = free_port()
+    env = {**os.environ, "PORT": str(port), "PIPELINE_MODE": mode, "CACHE_SIZE": "0"}
+    env.pop("CACHE_PATH", None)
+    server = subprocess.Popen([sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level",
+                               "warning"], env=env)
+    try:
+        for _ in range(300):  # wait for the server to be ready
+            try:
+                connection = http.client.HTTPConnection("127.0.0.1", port, timeout=1)
+                connection.request("GET", "/cache")
+                connection.getresponse().read()
+                break
+            except OSError:
+                time.sleep(0.1)
+        else:
+            raise RuntimeError("server did not start")
+
+        bodies = [multipart(f"{i}.pdf", content) for i, content in enumerate(documents)] * repeat
+
+        def post(request: tuple) -> tuple:
+            body, content_type = request
+            connection = http.client.HTTPConnection("127.0.0.1", port, timeout=120)
+            start = time.perf_counter()
+            connection.request("POST", "/file", body=body, headers={"Content-Type": content_type})
+            response = connection.getresponse()
+            response.read()
+            connection.close()
+            return time.perf_counter() - start, response.status
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            responses = list(pool.map(post, bodies))
+        result = summary([latency for latency, status in responses if status == 200], time.perf_counter() - start)
+        result["errors"] = sum(status != 200 for _, status in responses)
+        result["concurrency"] = concurrency
+        result["mode"] = mode
+        return result
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True).stdout.strip()
+    except OSError:
+        return ""
+
+
+def compare(results: dict, previous: dict) -> None:
+    """Print the ratio of each timing of `results` to the same timing in `previous`."""
+    def flatten(tree: dict, prefix: str = "") -> Dict[str, float]:
+        values = {}
+        for key, value in tree.items():
+            if isinstance(value, dict):
+                values.update(flatten(value, f"{prefix}{key}."))
+            elif isinstance(value, float):
+                values[f"{prefix}{key}"] = value
+        return values
+
+    before, after = flatten(previous.get("results", {})), flatten(results["results"])
+    print(f"compared with {previous.get('commit') or 'previous run'}:")
+    for name in sorted(before.keys() & after.keys()):
+        if before[name]:
+            print(f"  {name:<60} {before[name]:10.3f} -> {after[name]:10.3f} ({after[name] / before[name]:5.2f}x)")
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("--documents", type=int, default=50)
+    arg_parser.add_argument("--seed", type=int, default=0)
+    arg_parser.add_argument("--repeat", type=int, default=1)
+    arg_parser.add_argument("--scenarios", nargs="+", choices=list(SCENARIOS), default=list(SCENARIOS))
+    arg_parser.add_argument("--http", action="store_true", help="also benchmark the HTTP endpoint")
+    arg_parser.add_argument("--concurrency", type=int, default=8)
+    arg_parser.add_argument("--mode", choices=["process", "inline"], default="process")
+    arg_parser.add_argument("--output", help="write results to this JSON file")
+    arg_parser.add_argument("--compare", help="JSON results of a previous run")
+    args = arg_parser.parse_args()
+
+    documents = [content for _, content in make_corpus(args.documents, args.seed)]
+    results = {
+        "commit": git_commit(),
+        "rules_version": RULES_VERSION,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "corpus": {"documents": len(documents), "seed": args.seed, "bytes": sum(map(len, documents))},
+        "results": {},
+    }
+    for name in args.scenarios:
+        results["results"][name] = result = bench_pipeline(documents, repeat=args.repeat, **SCENARIOS[name])
+        print(f"{name:>10}: {result['docs_per_sec']:8.1f} docs/s  p50 {result['p50_ms']:7.2f} ms  "
+              f"p99 {result['p99_ms']:7.2f} ms  peak {result['peak_python_memory_mb']:6.1f} MiB")
+    if args.http:
+        results["results"]["http"] = result = bench_http(documents, args.concurrency, args.repeat, args.mode)
+        print(f"{'http':>10}: {result['docs_per_sec']:8.1f} docs/s  p50 {result['p50_ms']:7.2f} ms  "
+              f"p99 {result['p99_ms']:7.2f} ms  errors {result['errors']}")
+    results["peak_rss_mb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            compare(results, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""Benchmark of the post-processing cleanup: legacy chain of `re.sub` calls against
+the precompiled engine, per field and batched over a whole template.
+
+Field texts are extracted by the parser from the given PDF files, or from synthetic
+IPID pages when no file is given.
+
+Usage (from the `backend` directory):
+    python -m benchmarks.bench_post_processing [document.pdf ...] --repeat 200
+"""
+import argparse
+import re
+import timeit
+
+from src.fields import FIELDS
+from src.parser import Parser, segmenter
+from src.post_processing import PostProcessing, regex_not_new_line
+from src.reader import open_pdf
+from src.template import IpidBuilder
+
+from .bench_parser import make_pages
+
+
+def legacy_process(text: str) -> str:
+    """`PostProcessing._process` as it was before the precompiled engine."""
+    text = re.sub(r"[\?!✓\uf0fb]+", " - ", text)
+    text = re.sub(r":", " ", text)
+    text = re.sub(r"[\s\t]+", " ", text)
+    text = re.sub(regex_not_new_line, r"\2", text)
+    text = re.sub(r"[\s\t]+", " ", text)
+    text = re.sub(r"-+", " \n- ", text)
+    text = re.sub(r"(\n-)([\s\t]*\n-)", r"\1", text)
+    text = re.sub(r"[\s\t]+", " ", text)
+    return text.strip()
+
+
+def field_texts(paths: list) -> list:
+    """Raw (not yet post-processed) field texts of each document, as lists of strings."""
+    documents = []
+    parser = Parser()
+    for path in paths:
+        template = IpidBuilder()
+        with open_pdf(path) as document:
+            for page in document:
+                template = parser.parse_document(template, page)
+        texts = [template.text(field.name) for field in FIELDS if field.profile == "text"]
+        documents.append(texts + template.items("siren"))
+
+    if not documents:
+        pages = make_pages(4, lines_per_section=10)
+        sections = [field.section for field in FIELDS if field.section]
+        texts = ["".join(segmenter.extract(text)[section] for text in pages) for section in sections]
+        texts = [text.replace("- ligne", "✓ ligne :") for text in texts]
+        documents.append(texts + ["Assurance Habitation", "AXA", "722 057 460", "722 057 460 "])
+
+    return documents
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("paths", nargs="*")
+    arg_parser.add_argument("--repeat", type=int, default=200)
+    args = arg_parser.parse_args()
+
+    post_processor = PostProcessing()
+    documents = field_texts(args.paths)
+    for texts in documents:
+        assert [legacy_process(text) for text in texts] == post_processor.clean_many(texts), "outputs differ"
+
+    runs = {
+        "legacy": lambda: [[legacy_process(text) for text in texts] for texts in documents],
+        "precompiled": lambda: [[post_processor._process(text) for text in texts] for texts in documents],
+        "batched": lambda: [post_processor.clean_many(texts) for texts in documents],
+    }
+    n_texts = sum(len(texts) for texts in documents)
+    n_chars = sum(len(text) for texts in documents for text in texts)
+    print(f"{len(documents)} document(s), {n_texts} field texts, {n_chars} characters")
+
+    legacy = None
+    for name, run in runs.items():
+        seconds = timeit.timeit(run, number=args.repeat) / args.repeat
+        legacy = legacy or seconds
+        print(f"{name:>12}: {seconds / len(documents) * 1e6:9.1f} us/document "
+              f"{n_chars / seconds / 1e6:7.2f} Mchar/s {legacy / seconds:6.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""Benchmark of word recovery: `WordRecovery` against `VectorizedWordRecovery`, on
+dense pages of word fragments (words split into pieces listed out of order, as
+produced by some PDF generators).
+
+Usage (from the `backend` directory):
+    python -m benchmarks.bench_word_recovery --words 500 2000 8000 --repeat 20
+"""
+import argparse
+import random
+import timeit
+
+from fitz import Rect
+
+from src.word_recovery import VectorizedWordRecovery, WordRecovery
+
+
+def make_words(n_words: int, seed: int = 0) -> list:
+    """Synthetic output of `page.get_text("words")`: about `n_words` words on lines of
+    a page, split in fragments whose order is shuffled."""
+    rng = random.Random(seed)
+    words = []
+    x, y = 40.0, 40.0
+    for i in range(n_words):
+        word = rng.choice(["assurance", "garanties", "contrat", "à", "la", "couverture", "sinistre"])
+        letter_width = 5.0 + rng.random()
+        pieces = [word[:2], word[2:]] if len(word) > 3 and rng.random() < 0.5 else [word]
+        for piece in pieces:
+            width = letter_width * len(piece)
+            words.append([x, y - 9.0 + rng.random(), x + width, y, piece, 0, 0, len(words)])
+            x += width
+        x += letter_width * 1.5
+        if x > 500:
+            x, y = 40.0, y + 12.0
+    rng.shuffle(words)
+    return words
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("--words", type=int, nargs="+", default=[500, 2000, 8000])
+    arg_parser.add_argument("--repeat", type=int, default=20)
+    args = arg_parser.parse_args()
+
+    rect = Rect(0, 0, 595, 100000)
+    reference, vectorized = WordRecovery(), VectorizedWordRecovery()
+
+    print(f"{'words':>6} {'WordRecovery ms':>16} {'Vectorized ms':>14} {'speedup':>8}")
+    for n_words in args.words:
+        words = make_words(n_words)
+        assert reference(words, rect) == vectorized(words, rect), "outputs differ"
+        before = timeit.timeit(lambda: reference(words, rect), number=args.repeat) / args.repeat
+        after = timeit.timeit(lambda: vectorized(words, rect), number=args.repeat) / args.repeat
+        print(f"{n_words:>6} {before * 1e3:>16.2f} {after * 1e3:>14.2f} {before / after:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+"""Generator of synthetic IPID documents, for benchmarks.
+
+Documents vary in page count, order of the sections, column layout and text volume,
+and are fully determined by their parameters and seed, so that a corpus can be
+regenerated identically on another commit.
+
+Usage (from the `backend` directory), to write a corpus to a directory:
+    python -m benchmarks.corpus corpus/ --documents 50 --seed 0
+"""
+import argparse
+import os
+import random
+import textwrap
+from typing import Iterator, List, NamedTuple
+
+import fitz
+
+SECTIONS = [
+    "De quel type d'assurance s'agit-il ?",
+    "Qu'est-ce qui est assuré ?",
+    "Les garanties systématiquement prévues :",
+    "Les garanties optionnelles :",
+    "Les services et avantages",
+    "Qu'est-ce qui n'est pas assuré ?",
+    "Y-a-t-il des exclusions à la couverture ?",
+    "Où suis-je couvert ?",
+    "Quelles sont mes obligations ?",
+    "Quand et comment effectuer les paiements ?",
+    "Quand commence la couverture et quand prend-elle fin ?",
+    "Comment puis-je résilier le contrat ?",
+]
+
+INSURERS = ["AXA France IARD", "Groupama Rhône-Alpes", "Matmut", "AG2R La Mondiale", "Mutuelle Générale"]
+PRODUCTS = ["Assurance Habitation", "Assurance Automobile", "Assurance Santé", "Garantie Accidents de la Vie"]
+WORDS = ["garantie", "dommages", "contrat", "assuré", "sinistre", "cotisation", "franchise", "biens",
+         "responsabilité", "civile", "vol", "incendie", "dégâts", "des", "eaux", "à", "la", "le", "en", "cas", "de"]
+BULLETS = ["✓", "-", "!", "", ""]
+
+PAGE_WIDTH, PAGE_HEIGHT = 595, 842  # A4, in points
+MARGIN, GUTTER = 40, 30
+FONT_SIZE, LINE_HEIGHT = 8, 10
+
+
+class DocumentSpec(NamedTuple):
+    name: str
+    pages: int  # minimum number of pages, the text is spread over
+    columns: int  # 1 or 2
+    shuffled: bool  # sections in random order
+    lines_per_section: int  # text volume
+    seed: int
+
+
+def make_siren(rng: random.Random) -> str:
+    """Random SIREN number with a valid Luhn checksum, formatted as "123 456 789"."""
+    digits = [rng.randrange(10) for _ in range(8)]
+    total = sum(d if i % 2 else (2 * d - 9 if 2 * d > 9 else 2 * d) for i, d in enumerate(reversed(digits)))
+    digits = "".join(map(str, digits)) + str(-total % 10)
+    return f"{digits[:3]} {digits[3:6]} {digits[6:]}"
+
+
+def make_lines(spec: DocumentSpec) -> List[str]:
+    """Text lines of a document: header, sections and footer."""
+    rng = random.Random(spec.seed)
+    insurer, product = rng.choice(INSURERS), rng.choice(PRODUCTS)
+    siren = make_siren(rng)
+    lines = [
+        product,
+        "Document d'information sur le produit d'assurance",
+        f"Compagnie : {insurer} - SIREN {siren} - RCS Paris",
+        f"Produit : Formule {rng.choice(['Essentielle', 'Confort', 'Intégrale'])}",
+    ]
+
+    sections = list(SECTIONS)
+    if spec.shuffled:
+        rng.shuffle(sections)
+    for header in sections:
+        lines.append(header)
+        for _ in range(spec.lines_per_section):
+            words = " ".join(rng.choice(WORDS) for _ in range(rng.randint(4, 30)))
+            lines.append(f"{rng.choice(BULLETS)} {words[0].upper()}{words[1:]}".strip())
+
+    lines.append(f"{insurer}, entreprise régie par le Code des assurances, {siren} RCS Paris")
+    return lines
+
+
+def make_document(spec: DocumentSpec) -> bytes:
+    """Render the document described by `spec` as a pdf."""
+    column_width = (PAGE_WIDTH - 2 * MARGIN - (spec.columns - 1) * GUTTER) / spec.columns
+    width = int(column_width / (FONT_SIZE * 0.5))  # characters per line, for an average glyph width
+    lines = [wrapped for line in make_lines(spec) for wrapped in textwrap.wrap(line, width) or [""]]
+
+    # spread lines evenly over pages and columns
+    per_column = (PAGE_HEIGHT - 2 * MARGIN) // LINE_HEIGHT
+    per_column = min(per_column, -(-len(lines) // (spec.pages * spec.columns)))
+    columns = [lines[i:i + per_column] for i in range(0, len(lines), per_column)]
+
+    document = fitz.open()
+    for i in range(0, len(columns), spec.columns):
+        page = document.new_page(width=PAGE_WIDTH, height=PAGE_HEIGHT)
+        for j, column in enumerate(columns[i:i + spec.columns]):
+            x = MARGIN + j * (column_width + GUTTER)
+            for k, line in enumerate(column):
+                page.insert_text((x, MARGIN + (k + 1) * LINE_HEIGHT), line, fontsize=FONT_SIZE)
+    content = document.tobytes(garbage=3, deflate=True)
+    document.close()
+    return content
+
+
+def make_specs(n_documents: int, seed: int = 0) -> List[DocumentSpec]:
+    """Parameters of a corpus of `n_documents` documents."""
+    rng = random.Random(seed)
+    return [
+        DocumentSpec(
+            name=f"ipid-{seed}-{i:04d}.pdf",
+            pages=rng.choice([1, 2, 2, 3, 4, 8]),
+            columns=rng.choice([1, 1, 2]),
+            shuffled=rng.random() < 0.3,
+            lines_per_section=rng.choice([2, 5, 10, 20, 40]),
+            seed=rng.randrange(1 << 30),
+        )
+        for i in range(n_documents)
+    ]
+
+
+def make_corpus(n_documents: int, seed: int = 0) -> Iterator[tuple]:
+    """Yield (spec, pdf content) for each document of a corpus."""
+    for spec in make_specs(n_documents, seed):
+        yield spec, make_document(spec)
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("directory")
+    arg_parser.add_argument("--documents", type=int, default=50)
+    arg_parser.add_argument("--seed", type=int, default=0)
+    args = arg_parser.parse_args()
+
+    os.makedirs(args.directory, exist_ok=True)
+    for spec, content in make_corpus(args.documents, args.seed):
+        with open(os.path.join(args.directory, spec.name), "wb") as f:
+            f.write(content)
+    print(f"{args.documents} documents written to {args.directory}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""Soak test of the parsing pipeline: parse a synthetic IPID corpus (see
+`benchmarks.corpus`) in a loop, thousands of times, and check that the resident memory
+of the process stays flat once warm, i.e. that documents, pages and MuPDF buffers are
+released after each document.
+
+The process exits with an error if the memory grows by more than `--max-growth` MB
+between the end of the warm-up and the end of the run.
+
+Usage (from the `backend` directory):
+    python -m benchmarks.soak --documents 20 --iterations 5000
+    python -m benchmarks.soak --iterations 2000 --files --layout --store-size 0
+"""
+import argparse
+import os
+import resource
+import sys
+import tempfile
+import time
+from typing import List
+
+from src.pipeline import parse_document
+
+from .corpus import make_corpus
+
+
+def rss() -> int:
+    """Resident memory of the current process, in bytes (peak memory if not on Linux)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * (1 if sys.platform == "darwin" else 1024)
+
+
+def soak(documents: list, iterations: int, warmup: int, sample_every: int, **options) -> List[tuple]:
+    """Parse `documents` (contents or paths) in turn `iterations` times, and return
+    (iteration, seconds, rss) samples, the first one at the end of the `warmup` iterations.
+    """
+    samples = []
+    start = time.perf_counter()
+    for i in range(1, iterations + 1):
+        parse_document(documents[i % len(documents)], **options)
+        if (i >= warmup and (i - warmup) % sample_every == 0) or i == iterations:
+            samples.append((i, time.perf_counter() - start, rss()))
+    return samples
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("--documents", type=int, default=20, help="documents of the corpus")
+    arg_parser.add_argument("--iterations", type=int, default=5000, help="documents parsed in total")
+    arg_parser.add_argument("--warmup", type=int, default=200, help="documents parsed before the first sample")
+    arg_parser.add_argument("--sample-every", type=int, default=250)
+    arg_parser.add_argument("--max-growth", type=float, default=20.0, help="MB of memory growth allowed")
+    arg_parser.add_argument("--files", action="store_true", help="parse documents from files instead of contents")
+    arg_parser.add_argument("--store-size", type=int, help="bytes of MuPDF store kept between documents")
+    arg_parser.add_argument("--layout", action="store_true")
+    arg_parser.add_argument("--streaming", action="store_true")
+    args = arg_parser.parse_args()
+    if args.warmup >= args.iterations:
+        arg_parser.error("--warmup must be lower than --iterations")
+
+    options = {"layout": args.layout, "streaming": args.streaming}
+    if args.store_size is not None:
+        options["store_size"] = args.store_size
+
+    with tempfile.TemporaryDirectory() as directory:
+        documents = []
+        for spec, content in make_corpus(args.documents):
+            if args.files:
+                path = os.path.join(directory, spec.name)
+                with open(path, "wb") as f:
+                    f.write(content)
+                documents.append(path)
+            else:
+                documents.append(content)
+
+        samples = soak(documents, args.iterations, args.warmup, args.sample_every, **options)
+
+    print(f"{'documents':>10} {'seconds':>8} {'rss MB':>8}")
+    for i, seconds, memory in samples:
+        print(f"{i:>10} {seconds:>8.1f} {memory / 2 ** 20:>8.1f}")
+    growth = (samples[-1][2] - samples[0][2]) / 2 ** 20
+    print(f"growth after warm-up: {growth:+.1f} MB over {samples[-1][0] - samples[0][0]} documents")
+    if growth > args.max_growth:
+        sys.exit(f"memory grew by {growth:.1f} MB, more than {args.max_growth} MB")
+
+
+if __name__ == "__main__":
+    main()
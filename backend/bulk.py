@@ -0,0 +1,282 @@
+"""Parse directories of IPID pdfs offline, in a pool of worker processes.
+
+Results are written incrementally, one record per document, to a JSONL file or to
+Parquet files (requires pyarrow). The sha256 of every document parsed without error is
+appended to a checkpoint file, so that an interrupted run can be resumed: documents whose
+hash is in the checkpoint are skipped, while those which failed are parsed again (their
+error records stay in the output).
+
+With `--text-store`, the text of every page read is also saved, compressed, so that after
+a change of the extraction rules the corpus can be parsed again from its stored texts with
+`--reparse`, without reading any pdf. Documents of which only the first pages were read
+(with `--early-exit` or `--max-pages`, or rejected as not IPIDs) are skipped and reported.
+
+Usage (from the `backend` directory):
+    python bulk.py archive/ more/*.pdf --output results.jsonl --workers 8 --text-store texts.db
+    python bulk.py --from-list paths.txt --output results/ --format parquet
+    python bulk.py --reparse --text-store texts.db --output results-v2.jsonl
+"""
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+from multiprocessing import Pool
+from typing import Iterable, Iterator, List, Optional, Set
+
+from src.fields import FIELDS, select_fields
+from src.parallel import init_document_worker
+from src.pipeline import parse_document
+from src.text_store import open_text_store
+
+# state of each worker process, set by `init_worker`
+completed: Set[str] = set()
+options: dict = {}
+
+
+def iter_paths(inputs: Iterable[str]) -> Iterator[str]:
+    """Yield the pdf files of `inputs`, which are pdf files or directories walked recursively."""
+    for path in inputs:
+        if os.path.isdir(path):
+            for root, dirs, files in os.walk(path):
+                dirs.sort()
+                for name in sorted(files):
+                    if name.lower().endswith(".pdf"):
+                        yield os.path.join(root, name)
+        else:
+            yield path
+
+
+def init_worker(done: Set[str], pipeline_options: dict, pool: bool = False) -> None:
+    global completed, options
+    completed, options = done, pipeline_options
+    if pool:
+        init_document_worker()
+
+
+def parse_path(path: str) -> dict:
+    """Parse the pdf at `path`, unless its hash is in the checkpoint. Errors are returned
+    in the record, so that they do not stop the run.
+    """
+    record = {"filename": path, "sha256": None, "ipid": None, "error": None}
+    try:
+        with open(path, "rb") as f:
+            content = f.read()
+        record["sha256"] = hashlib.sha256(content).hexdigest()
+        if record["sha256"] in completed:
+            return {**record, "skipped": True}
+        record["ipid"] = parse_document(content, digest=record["sha256"], **options).dict()
+    except Exception as e:
+        record["error"] = f"{type(e).__name__}: {e}"
+    return record
+
+
+def reparse_digest(digest: str) -> dict:
+    """Parse the document of hash `digest` from its texts in the text store, unless its
+    hash is in the checkpoint.
+    """
+    record = {"filename": None, "sha256": digest, "ipid": None, "error": None}
+    if digest in completed:
+        return {**record, "skipped": True}
+    try:
+        record["ipid"] = parse_document(None, digest=digest, **options).dict()
+    except Exception as e:
+        record["error"] = f"{type(e).__name__}: {e}"
+    return record
+
+
+class JsonlWriter:
+    """Append records to a JSONL file."""
+
+    def __init__(self, path: str):
+        self.file = open(path, "a", encoding="utf-8")
+
+    def write(self, records: List[dict]) -> None:
+        self.file.writelines(json.dumps(record, ensure_ascii=False) + "\n" for record in records)
+        self.file.flush()
+
+    def close(self) -> None:
+        self.file.close()
+
+
+class ParquetWriter:
+    """Write records to a new Parquet file in directory `path`, one row group per call
+    to `write`, with a column per field of the template.
+    """
+
+    def __init__(self, path: str):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise SystemExit("Parquet output requires pyarrow: pip install pyarrow")
+        self.pa = pa
+        os.makedirs(path, exist_ok=True)
+        columns = [("filename", pa.string()), ("sha256", pa.string()), ("error", pa.string()),
+                   ("pages", pa.int32()), ("is_ipid", pa.bool_())]
+        columns += [(f"{field.group}_{field.name}", pa.list_(pa.string()) if field.profile == "list" else pa.string())
+                    for field in FIELDS]
+        self.schema = pa.schema(columns)
+        name = os.path.join(path, f"part-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}.parquet")
+        self.writer = pq.ParquetWriter(name, self.schema)
+
+    def write(self, records: List[dict]) -> None:
+        rows = []
+        for record in records:
+            ipid = record["ipid"] or {}
+            row = {"filename": record["filename"], "sha256": record["sha256"], "error": record["error"],
+                   "pages": ipid.get("metadata", {}).get("pages"), "is_ipid": ipid.get("metadata", {}).get("is_ipid")}
+            for field in FIELDS:
+                row[f"{field.group}_{field.name}"] = ipid.get(field.group, {}).get(field.name)
+            rows.append(row)
+        self.writer.write_table(self.pa.Table.from_pylist(rows, schema=self.schema))
+
+    def close(self) -> None:
+        self.writer.close()
+
+
+class Checkpoint:
+    """Hashes of the documents already written, in a text file with one hash per line."""
+
+    def __init__(self, path: Optional[str]):
+        self.path = path
+        self.hashes = set()
+        if path and os.path.exists(path):
+            with open(path) as f:
+                self.hashes = {line.strip() for line in f if line.strip()}
+        self.file = open(path, "a") if path else None
+
+    def add(self, hashes: List[str]) -> None:
+        self.hashes.update(hashes)
+        if self.file is not None:
+            self.file.writelines(digest + "\n" for digest in hashes)
+            self.file.flush()
+
+    def close(self) -> None:
+        if self.file is not None:
+            self.file.close()
+
+
+class Progress:
+    """Throughput report, printed to stderr every `interval` seconds."""
+
+    def __init__(self, total: int, interval: float = 5.0):
+        self.total = total
+        self.interval = interval
+        self.start = self.last = time.perf_counter()
+        self.parsed = self.skipped = self.errors = 0
+
+    def update(self, record: dict) -> None:
+        if record.get("skipped"):
+            self.skipped += 1
+        else:
+            self.parsed += 1
+            self.errors += record["error"] is not None
+        if time.perf_counter() - self.last >= self.interval:
+            self.report()
+
+    def report(self) -> None:
+        self.last = time.perf_counter()
+        elapsed = self.last - self.start
+        done = self.parsed + self.skipped
+        rate = self.parsed / elapsed if elapsed else 0.0
+        eta = (self.total - done) / rate if rate else float("inf")
+        print(f"{done}/{self.total} documents ({self.skipped} skipped, {self.errors} errors), "
+              f"{rate:.1f} docs/s, elapsed {elapsed:.0f}s, eta {eta:.0f}s", file=sys.stderr)
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("inputs", nargs="*", help="pdf files or directories")
+    arg_parser.add_argument("--from-list", help="text file with one pdf path per line")
+    arg_parser.add_argument("--output", required=True, help="JSONL file, or directory of Parquet files")
+    arg_parser.add_argument("--format", choices=["jsonl", "parquet"], default="jsonl")
+    arg_parser.add_argument("--checkpoint", help="file of completed hashes, default: <output>.checkpoint")
+    arg_parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="0 to parse in this process")
+    arg_parser.add_argument("--chunksize", type=int, default=16, help="documents sent to a worker at once")
+    arg_parser.add_argument("--max-tasks-per-child", type=int, help="documents parsed before a worker is replaced")
+    arg_parser.add_argument("--flush-every", type=int, default=256, help="records written at once")
+    arg_parser.add_argument("--report-every", type=float, default=5.0, help="seconds between progress reports")
+    arg_parser.add_argument("--text-store", help="SQLite file where page texts are stored and reused")
+    arg_parser.add_argument("--reparse", action="store_true", help="parse the documents of the text store")
+    arg_parser.add_argument("--parallel-pages", type=int,
+                            help="extract the pages of documents of at least this many pages in parallel")
+    arg_parser.add_argument("--parallel-workers", type=int, help="processes extracting the pages of a document")
+
+    # pipeline options
+    arg_parser.add_argument("--streaming", action="store_true")
+    arg_parser.add_argument("--fields", nargs="+")
+    arg_parser.add_argument("--early-exit", action="store_true")
+    arg_parser.add_argument("--max-pages", type=int)
+    arg_parser.add_argument("--layout", action="store_true")
+    arg_parser.add_argument("--no-classify", action="store_true", help="parse documents which do not look like IPIDs")
+    arg_parser.add_argument("--provenance", action="store_true", help="record where each field was found (JSONL only)")
+    args = arg_parser.parse_args()
+
+    try:
+        select_fields(args.fields)
+    except ValueError as e:
+        arg_parser.error(str(e))
+    if args.reparse and not args.text_store:
+        arg_parser.error("--reparse requires --text-store")
+    if args.parallel_pages is not None and args.workers > 0:
+        arg_parser.error("--parallel-pages requires --workers 0, documents being otherwise parsed in parallel")
+    pipeline_options = {"streaming": args.streaming, "fields": args.fields, "early_exit": args.early_exit,
+                        "max_pages": args.max_pages, "layout": args.layout, "classify_first": not args.no_classify,
+                        "provenance": args.provenance, "text_store": args.text_store,
+                        "parallel_pages": args.parallel_pages, "parallel_workers": args.parallel_workers}
+
+    # 1. list documents: pdf files, or hashes of the documents of the text store
+    if args.reparse:
+        store = open_text_store(args.text_store)
+        parse, paths = reparse_digest, list(store.digests(layout=args.layout, max_pages=args.max_pages))
+        partial = sum(1 for _ in store.digests(layout=args.layout, max_pages=args.max_pages, partial=True))
+        if partial:
+            print(f"{partial} documents skipped, only their first pages are stored (parsed with --early-exit or "
+                  "--max-pages, or not IPIDs): parse them from their pdfs instead", file=sys.stderr)
+    else:
+        inputs = list(args.inputs)
+        if args.from_list:
+            with open(args.from_list) as f:
+                inputs.extend(line.strip() for line in f if line.strip())
+        parse, paths = parse_path, list(iter_paths(inputs))
+
+    # 2. parse, skipping documents of the checkpoint
+    checkpoint = Checkpoint(args.checkpoint or args.output.rstrip("/") + ".checkpoint")
+    writer = ParquetWriter(args.output) if args.format == "parquet" else JsonlWriter(args.output)
+    progress = Progress(len(paths), interval=args.report_every)
+    if args.workers > 0:
+        pool = Pool(args.workers, initializer=init_worker, initargs=(checkpoint.hashes, pipeline_options, True),
+                    maxtasksperchild=args.max_tasks_per_child)
+        records = pool.imap_unordered(parse, paths, chunksize=args.chunksize)
+    else:
+        pool = None
+        init_worker(checkpoint.hashes, pipeline_options)
+        records = map(parse, paths)
+
+    # 3. write results, then record the hashes of those without error in the checkpoint
+    batch = []
+    try:
+        for record in records:
+            progress.update(record)
+            if record.pop("skipped", False):
+                continue
+            batch.append(record)
+            if len(batch) >= args.flush_every:
+                writer.write(batch)
+                checkpoint.add([record["sha256"] for record in batch if record["error"] is None])
+                batch = []
+    finally:
+        if batch:
+            writer.write(batch)
+            checkpoint.add([record["sha256"] for record in batch if record["error"] is None])
+        writer.close()
+        checkpoint.close()
+        if pool is not None:
+            pool.terminate()
+        progress.report()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,27 +1,194 @@
 import os
+import time
+import zipfile
+from typing import List, Optional
 
 import uvicorn
 from dotenv import load_dotenv
-from fastapi import FastAPI, File, UploadFile
+from fastapi import Depends, FastAPI, File, Header, HTTPException, Query, Request, Response, UploadFile
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from starlette.routing import Match
 
-from src.pipeline import parse_document
-from src.template import Ipid
-
-# load env variables from .env from specified path
+# load env variables from .env from specified path, before the pipeline reads them (INSURERS_PATH)
 DOTENV_PATH = os.environ.get('DOTENV_PATH', './.env')
 load_dotenv(dotenv_path=DOTENV_PATH, verbose=True)
+
+from src.batch import check_sizes, iter_documents, parse_batch  # noqa: E402
+from src.cache import ResultCache, parse_cached  # noqa: E402
+from src.executor import PipelineExecutor, QueueFullError  # noqa: E402
+from src.fields import select_fields  # noqa: E402
+from src.jobs import JobRunner, JobStore, JobStoreFullError  # noqa: E402
+from src.metrics import Metrics, timing_header  # noqa: E402
+from src.template import Ipid, Job  # noqa: E402
+from src.upload import UploadTooLargeError, spool_upload  # noqa: E402
+
 PORT = int(os.environ.get('PORT'))
 
+# pipeline execution: "process" (worker pool) or "inline" (in the event loop)
+PIPELINE_MODE = os.environ.get('PIPELINE_MODE', 'process')
+PIPELINE_WORKERS = int(os.environ.get('PIPELINE_WORKERS', os.cpu_count() or 1))
+PIPELINE_MAX_JOBS = int(os.environ.get('PIPELINE_MAX_JOBS', 4 * PIPELINE_WORKERS))
+
+# result cache: in-memory LRU size, and optional SQLite file shared by workers, with its maximum size
+CACHE_SIZE = int(os.environ.get('CACHE_SIZE', 1024))
+CACHE_PATH = os.environ.get('CACHE_PATH')
+CACHE_DISK_SIZE = int(os.environ.get('CACHE_DISK_SIZE', 100000))
+
+# uploads are spooled to temporary files, in UPLOAD_DIR if set
+MAX_UPLOAD_SIZE = int(os.environ.get('MAX_UPLOAD_SIZE', 50 * 1024 * 1024))  # per document, zip members included
+MAX_BATCH_SIZE = int(os.environ.get('MAX_BATCH_SIZE', 20 * MAX_UPLOAD_SIZE))  # per /files request
+UPLOAD_DIR = os.environ.get('UPLOAD_DIR')
+
+# page texts of parsed documents, reused when the extraction rules change (SQLite file, disabled if unset)
+TEXT_STORE_PATH = os.environ.get('TEXT_STORE_PATH')
+
+# pages of documents of at least PARALLEL_PAGES pages are extracted by PARALLEL_WORKERS processes
+# (disabled if unset, and in PIPELINE_MODE=process where documents are already parsed in parallel)
+PARALLEL_PAGES = int(os.environ['PARALLEL_PAGES']) if os.environ.get('PARALLEL_PAGES') else None
+PARALLEL_WORKERS = int(os.environ.get('PARALLEL_WORKERS', os.cpu_count() or 1))
+
+# the MuPDF store is emptied after a document if it holds more than MUPDF_STORE_SIZE bytes
+MUPDF_STORE_SIZE = int(os.environ.get('MUPDF_STORE_SIZE', 64 * 1024 * 1024))
+
+PIPELINE_SETTINGS = {"text_store": TEXT_STORE_PATH, "parallel_pages": PARALLEL_PAGES,
+                     "parallel_workers": PARALLEL_WORKERS, "store_size": MUPDF_STORE_SIZE}
+
+# asynchronous jobs: optional SQLite file shared by server processes, expiry of finished jobs in seconds, maximum count
+JOBS_PATH = os.environ.get('JOBS_PATH')
+JOBS_TTL = float(os.environ.get('JOBS_TTL', 3600))
+JOBS_MAX = int(os.environ.get('JOBS_MAX', 1000))
+
 
 app = FastAPI()
+executor = PipelineExecutor(mode=PIPELINE_MODE, workers=PIPELINE_WORKERS, max_jobs=PIPELINE_MAX_JOBS)
+cache = ResultCache(size=CACHE_SIZE, path=CACHE_PATH, disk_size=CACHE_DISK_SIZE)
+metrics = Metrics()
+jobs = JobStore(path=JOBS_PATH, ttl=JOBS_TTL, max_jobs=JOBS_MAX)
+job_runner = JobRunner(jobs, executor, cache, concurrency=executor.workers, metrics=metrics,
+                       settings=PIPELINE_SETTINGS)
+
+
+@app.on_event("startup")
+def start_executor():
+    executor.start()  # warm up worker pool
+    job_runner.start()
+
+
+@app.on_event("shutdown")
+async def shutdown_executor():
+    await job_runner.shutdown()
+    executor.shutdown()
+
+
+@app.middleware("http")
+async def observe_request(request: Request, call_next):
+    start = time.perf_counter()
+    response = await call_next(request)
+    # label requests by route, to keep the number of label values bounded
+    path = next((route.path for route in app.routes if route.matches(request.scope)[0] == Match.FULL), "other")
+    metrics.observe_request(request.method, path, response.status_code, time.perf_counter() - start)
+    return response
+
+
+@app.middleware("http")
+async def limit_upload_size(request: Request, call_next):
+    # reject oversize uploads before their body is read
+    content_length = request.headers.get("content-length")
+    max_size = {"/file": MAX_UPLOAD_SIZE, "/jobs": MAX_UPLOAD_SIZE, "/files": MAX_BATCH_SIZE}.get(request.url.path)
+    if max_size is not None and content_length and int(content_length) > max_size:
+        return JSONResponse(status_code=413, content={"detail": f"Upload exceeds {max_size} bytes."})
+    return await call_next(request)
+
+
+def parse_options(streaming: bool = False, fields: Optional[List[str]] = Query(None), early_exit: bool = False,
+                  max_pages: Optional[int] = Query(None, ge=1), layout: bool = False, classify: bool = True,
+                  provenance: bool = False) -> dict:
+    """Pipeline options, from the query parameters of a parsing request.
+    """
+    try:
+        select_fields(fields)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    return {"streaming": streaming, "fields": fields, "early_exit": early_exit, "max_pages": max_pages,
+            "layout": layout, "classify_first": classify, "provenance": provenance}
 
 
 @app.post("/file")
-async def upload_file(file: UploadFile = File(...)) -> Ipid:
-    bytes_file = await file.read()  # load pdf file
-    parsed_document = parse_document(bytes_file)  # run pipeline
+async def upload_file(response: Response, file: UploadFile = File(...), options: dict = Depends(parse_options),
+                      x_timing: bool = Header(False)) -> Ipid:
+    try:
+        path, digest = await spool_upload(file, max_size=MAX_UPLOAD_SIZE, directory=UPLOAD_DIR)  # save pdf file
+    except UploadTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+
+    try:
+        parsed_document = await parse_cached(executor, cache, path, digest=digest, metrics=metrics,
+                                             settings=PIPELINE_SETTINGS, **options)  # run pipeline
+    except QueueFullError:
+        raise HTTPException(status_code=503, detail="Too many documents being parsed, retry later.",
+                            headers={"Retry-After": "1"})
+    finally:
+        os.remove(path)
+
+    if x_timing:  # opt-in breakdown of the pipeline stages
+        response.headers["X-Timing"] = timing_header(parsed_document.metadata)
     return parsed_document
 
 
+@app.post("/files")
+async def upload_files(files: List[UploadFile] = File(...), options: dict = Depends(parse_options)) -> StreamingResponse:
+    uploads = [(file.filename, file.file) for file in files]  # pdf files and zip archives
+    try:
+        check_sizes(uploads, max_size=MAX_UPLOAD_SIZE)  # before any document is read
+    except UploadTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except zipfile.BadZipFile as e:
+        raise HTTPException(status_code=400, detail=f"Invalid zip archive, {e}")
+    documents = iter_documents(uploads, max_size=MAX_UPLOAD_SIZE)
+    results = parse_batch(executor, cache, documents, concurrency=executor.workers, metrics=metrics,
+                          settings=PIPELINE_SETTINGS, **options)
+    lines = (result.json() + "\n" async for result in results)  # one json line per document
+    return StreamingResponse(lines, media_type="application/x-ndjson")
+
+
+@app.post("/jobs", status_code=202)
+async def create_job(response: Response, file: UploadFile = File(...), options: dict = Depends(parse_options)) -> Job:
+    try:
+        path, digest = await spool_upload(file, max_size=MAX_UPLOAD_SIZE, directory=UPLOAD_DIR)  # save pdf file
+    except UploadTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+
+    try:
+        job = await jobs.create(filename=file.filename)
+    except JobStoreFullError:
+        os.remove(path)
+        raise HTTPException(status_code=503, detail="Too many jobs, retry later.", headers={"Retry-After": "10"})
+    job_runner.submit(job, path, digest, **options)  # parsed in the background
+    response.headers["Location"] = f"/jobs/{job.id}"
+    return job
+
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str) -> Job:
+    job = await jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired job.")
+    return job
+
+
+@app.get("/cache")
+def cache_stats() -> dict:
+    return cache.stats()
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics_text() -> str:
+    gauges = {f"ipid_cache_{name}": value for name, value in cache.stats().items()}
+    gauges["ipid_jobs_in_flight"] = executor.jobs
+    gauges["ipid_async_jobs_queued"] = job_runner.queue.qsize() if job_runner.queue else 0
+    gauges.update({f"ipid_async_jobs_{status}": count for status, count in (await jobs.stats()).items()})
+    return metrics.render(gauges)
+
+
 if __name__ == "__main__":
     uvicorn.run(app, host="0.0.0.0", port=PORT)
@@ -0,0 +1,103 @@
+import asyncio
+import os
+import zipfile
+from functools import partial
+from typing import AsyncIterator, BinaryIO, Callable, Iterable, Iterator, Optional, Tuple
+
+from .cache import ResultCache, parse_cached
+from .executor import PipelineExecutor, QueueFullError
+from .template import BatchResult
+from .upload import UploadTooLargeError
+
+
+def iter_members(uploads: Iterable[Tuple[str, BinaryIO]]) -> Iterator[Tuple[str, int, Callable[[], bytes]]]:
+    """Yield (filename, size, read) for each uploaded document, without reading it: `read()`
+    returns its content. Zip archives are expanded into the pdf files they contain, named
+    `archive.zip/member.pdf`, whose size is their uncompressed size (zipfile never reads more).
+    """
+    for filename, fileobj in uploads:
+        if zipfile.is_zipfile(fileobj):
+            fileobj.seek(0)
+            try:
+                archive = zipfile.ZipFile(fileobj)
+            except zipfile.BadZipFile as e:
+                raise zipfile.BadZipFile(f"{filename}: {e}")
+            with archive:
+                for member in archive.infolist():
+                    if member.is_dir() or not member.filename.lower().endswith(".pdf"):
+                        continue
+                    yield f"{filename}/{member.filename}", member.file_size, partial(archive.read, member)
+        else:
+            size = fileobj.seek(0, os.SEEK_END)
+            fileobj.seek(0)
+            yield filename, size, fileobj.read
+
+
+def check_sizes(uploads: Iterable[Tuple[str, BinaryIO]], max_size: int) -> None:
+    """Raise `UploadTooLargeError` if a document of `uploads` exceeds `max_size` bytes,
+    or `zipfile.BadZipFile` if the directory of an archive cannot be read.
+    """
+    for filename, size, _ in iter_members(uploads):
+        if size > max_size:
+            raise UploadTooLargeError(f"{filename} exceeds the maximum upload size of {max_size} bytes")
+
+
+def iter_documents(uploads: Iterable[Tuple[str, BinaryIO]],
+                   max_size: Optional[int] = None) -> Iterator[Tuple[str, Callable[[], bytes]]]:
+    """Yield (filename, read) for each uploaded document (see `iter_members`), where `read()`
+    returns its content and must be called before the next document is yielded. Documents
+    exceeding `max_size` bytes raise `UploadTooLargeError` when read, before being read.
+    """
+    for filename, size, read in iter_members(uploads):
+        if max_size is not None and size > max_size:
+            read = partial(_too_large, filename, max_size)
+        yield filename, read
+
+
+def _too_large(filename: str, max_size: int) -> bytes:
+    raise UploadTooLargeError(f"{filename} exceeds the maximum upload size of {max_size} bytes")
+
+
+async def parse_one(executor: PipelineExecutor, cache: ResultCache, filename: str, content: bytes,
+                    **kwargs) -> BatchResult:
+    """Parse a single document of a batch. Parsing errors are returned in the result
+    instead of being raised, so that they do not interrupt the batch. While the executor
+    is full (e.g. busy with synchronous requests), the document waits for a free slot.
+    """
+    try:
+        while True:
+            try:
+                ipid = await parse_cached(executor, cache, content, **kwargs)
+                break
+            except QueueFullError:
+                await asyncio.sleep(0.1)
+    except Exception as e:
+        return BatchResult(filename=filename, error=f"{type(e).__name__}: {e}")
+    return BatchResult(filename=filename, ipid=ipid)
+
+
+async def parse_batch(executor: PipelineExecutor, cache: ResultCache,
+                      documents: Iterable[Tuple[str, Callable[[], bytes]]],
+                      concurrency: int, **kwargs) -> AsyncIterator[BatchResult]:
+    """Parse `documents`, given by their filename and a function reading their content (see
+    `iter_documents`), with at most `concurrency` of them in flight, and yield results in
+    completion order. Documents which cannot be read (e.g. corrupted or encrypted zip
+    members) are returned with their error, like parsing errors.
+    """
+    pending = set()
+    for filename, read in documents:
+        try:
+            content = read()  # before the next document, while its archive is open
+        except Exception as e:
+            yield BatchResult(filename=filename, error=f"{type(e).__name__}: {e}")
+            continue
+        if len(pending) >= concurrency:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                yield task.result()
+        pending.add(asyncio.ensure_future(parse_one(executor, cache, filename, content, **kwargs)))
+
+    while pending:
+        done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            yield task.result()
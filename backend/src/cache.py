@@ -0,0 +1,173 @@
+import asyncio
+import hashlib
+import sqlite3
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional, Union
+
+from .executor import PipelineExecutor
+from .metrics import Metrics
+from .pipeline import RULES_VERSION, parse_document
+from .template import Ipid
+
+# results written to the SQLite tier between two trims to its maximum size
+TRIM_EVERY = 100
+
+
+class ResultCache:
+    """Cache of parsed documents, keyed by a hash of the uploaded bytes, the pipeline
+    options and the version of the extraction rules.
+
+    Results are kept in a bounded in-memory LRU, backed by an optional SQLite file
+    which can be shared by several worker processes. The SQLite tier keeps the
+    `disk_size` most recently used results (unbounded if None), and drops the results
+    of other versions of the rules when opened. Its queries run in a thread of their
+    own, off the event loop.
+    """
+
+    def __init__(self, size: int = 1024, path: Optional[str] = None, disk_size: Optional[int] = None):
+        self.size = size
+        self.disk_size = disk_size
+        self.memory = OrderedDict()
+        self.db = None
+        self.io = None
+        self.writes = 0  # results written to the SQLite tier since the last trim
+
+        # counters
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.disk_evictions = 0
+
+        if path:
+            self.db = sqlite3.connect(path, timeout=30, check_same_thread=False)
+            self.db.execute("PRAGMA journal_mode=WAL")
+            self.db.execute("CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, ipid TEXT NOT NULL)")
+            columns = {row[1] for row in self.db.execute("PRAGMA table_info(results)")}
+            if "used" not in columns:  # files created before the SQLite tier was bounded
+                self.db.execute("ALTER TABLE results ADD COLUMN used REAL NOT NULL DEFAULT 0")
+            self.db.execute("CREATE INDEX IF NOT EXISTS results_used ON results (used)")
+            self.db.commit()
+            self.disk_evictions += self.purge() + self.trim()
+            self.io = ThreadPoolExecutor(max_workers=1)  # a single thread uses the connection
+
+    @staticmethod
+    def key(digest: str, **options) -> str:
+        """Cache key of a document, given the sha256 `digest` of its content, parsed
+        with pipeline `options`.
+        """
+        options = ",".join(f"{name}={sorted(value) if isinstance(value, list) else value}"
+                           for name, value in sorted(options.items()))
+        return f"{RULES_VERSION}:{digest}:{options}"
+
+    async def get(self, key: str) -> Optional[Ipid]:
+        if key in self.memory:
+            self.memory.move_to_end(key)
+            self.hits += 1
+            return self.memory[key]
+
+        if self.db is not None:
+            ipid = await self._run(self._disk_get, key)
+            if ipid is not None:
+                self._remember(key, ipid)
+                self.hits += 1
+                self.disk_hits += 1
+                return ipid
+
+        self.misses += 1
+        return None
+
+    async def set(self, key: str, ipid: Ipid) -> None:
+        self._remember(key, ipid)
+        if self.db is not None:
+            await self._run(self._disk_set, key, ipid)
+
+    def purge(self) -> int:
+        """Delete the results of other versions of the rules from the SQLite tier, and
+        return their number.
+        """
+        prefix = f"{RULES_VERSION}:"
+        count = self.db.execute("DELETE FROM results WHERE substr(key, 1, ?) != ?", (len(prefix), prefix)).rowcount
+        self.db.commit()
+        return count
+
+    def trim(self) -> int:
+        """Delete the least recently used results beyond `disk_size` from the SQLite tier,
+        and return their number.
+        """
+        if self.disk_size is None:
+            return 0
+        count = self.db.execute("DELETE FROM results WHERE key IN (SELECT key FROM results ORDER BY used DESC "
+                                "LIMIT -1 OFFSET ?)", (self.disk_size,)).rowcount
+        self.db.commit()
+        return count
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self.memory),
+            "max_size": self.size,
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "disk_evictions": self.disk_evictions,
+        }
+
+    def _remember(self, key: str, ipid: Ipid) -> None:
+        """Add `ipid` to the in-memory tier, evicting the least recently used results.
+        """
+        if self.size <= 0:
+            return
+        self.memory[key] = ipid
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.size:
+            self.memory.popitem(last=False)
+            self.evictions += 1
+
+    async def _run(self, func: Callable, *args):
+        """Run a query of the SQLite tier in its thread."""
+        return await asyncio.get_running_loop().run_in_executor(self.io, func, *args)
+
+    def _disk_get(self, key: str) -> Optional[Ipid]:
+        row = self.db.execute("SELECT ipid FROM results WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        self.db.execute("UPDATE results SET used = ? WHERE key = ?", (time.time(), key))
+        self.db.commit()
+        return Ipid.parse_raw(row[0])
+
+    def _disk_set(self, key: str, ipid: Ipid) -> None:
+        self.db.execute("INSERT OR REPLACE INTO results (key, ipid, used) VALUES (?, ?, ?)",
+                        (key, ipid.json(), time.time()))
+        self.db.commit()
+        self.writes += 1
+        if self.writes >= TRIM_EVERY:
+            self.writes = 0
+            self.disk_evictions += self.trim()
+
+
+async def parse_cached(executor: PipelineExecutor, cache: ResultCache, document: Union[str, bytes],
+                       digest: Optional[str] = None, metrics: Optional[Metrics] = None,
+                       settings: Optional[dict] = None, **options) -> Ipid:
+    """Parse `document` (its content or its path) with `executor`, unless its result is
+    already in `cache`. The sha256 `digest` of the content is computed if not given.
+    Documents actually parsed are observed by `metrics`, if given, and results served from
+    the cache are marked as such in their metadata.
+
+    `options` change the result and are part of the cache key, while `settings` (e.g. the
+    text store or parallel extraction) only change how the pipeline runs.
+    """
+    if digest is None:
+        digest = hashlib.sha256(document).hexdigest()
+    key = cache.key(digest, **options)
+    ipid = await cache.get(key)
+    if ipid is not None:  # copied, as the cached result may be shared
+        return ipid.copy(update={"metadata": ipid.metadata.copy(update={"cached": True})})
+
+    ipid = await executor.run(parse_document, document, digest=digest, **(settings or {}), **options)
+    await cache.set(key, ipid)
+    if metrics is not None:
+        metrics.observe_document(ipid.metadata)
+    return ipid
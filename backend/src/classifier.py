@@ -0,0 +1,59 @@
+import re
+from typing import NamedTuple, Optional
+
+from fitz import Document
+
+from .parser import regex_field
+from .reader import get_pdf_metadata
+from .segmenter import Segmenter
+
+# title of every IPID, and words hinting at an IPID in the pdf metadata
+title_regex = re.compile(r"document[\t\s\n]d[’']information[\t\s\n]sur[\t\s\n]le[\t\s\n]produit[\t\s\n]d[’']assurance",
+                         re.IGNORECASE)
+metadata_regex = re.compile(r"\bipid\b|document\sd[’']information|produit\sd[’']assurance", re.IGNORECASE)
+
+# IPID title and section headers, compiled into a single pattern
+markers = Segmenter({"title": title_regex, **regex_field})
+
+# IPIDs are short documents
+MAX_IPID_PAGES = 10
+
+
+class Classification(NamedTuple):
+    is_ipid: bool
+    confidence: float  # between 0 and 1
+    text: Optional[str]  # text of the first page, to be reused by the parser
+
+
+def classify(document: Document, threshold: float = 0.5) -> Classification:
+    """Tell whether `document` is an IPID from its metadata, page count and the text of its
+    first page only, so that other documents are rejected before being fully parsed.
+
+    The confidence adds up the IPID title (0.6), each distinct section header (0.15) found
+    on the first page, and IPID words in the pdf metadata (0.2). It is halved for documents
+    longer than `MAX_IPID_PAGES` pages, unless they have the IPID title (e.g. booklets).
+    """
+    if document.page_count == 0:
+        return Classification(False, 0.0, None)
+    text = document[0].get_text("text")
+    return classify_text(text, document.page_count, get_pdf_metadata(document), threshold=threshold)
+
+
+def classify_text(text: str, page_count: int, metadata: dict, threshold: float = 0.5) -> Classification:
+    """Tell whether a document is an IPID from the `text` of its first page, its page count
+    and pdf `metadata` (see `classify`).
+    """
+    # 1. first page markers, in a single scan
+    found = {boundary.section for boundary in markers.segment(text)}
+    confidence = 0.6 * ("title" in found) + 0.15 * len(found - {"title"})
+
+    # 2. pdf metadata
+    if any(metadata_regex.search(metadata.get(key) or "") for key in ("title", "subject", "keywords")):
+        confidence += 0.2
+
+    # 3. page count
+    if page_count > MAX_IPID_PAGES and "title" not in found:
+        confidence /= 2
+
+    confidence = min(confidence, 1.0)
+    return Classification(confidence >= threshold, round(confidence, 3), text)
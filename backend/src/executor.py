@@ -0,0 +1,75 @@
+import asyncio
+import os
+from concurrent.futures import ProcessPoolExecutor, wait
+from functools import partial
+from typing import Callable, Optional
+
+import fitz
+
+from .parallel import init_document_worker
+
+
+class QueueFullError(Exception):
+    """Raised when the maximum number of jobs in flight is reached."""
+
+
+def warm_up() -> int:
+    """Load the pipeline modules (compiled regexes, insurer dictionary) and MuPDF in a
+    worker process.
+    """
+    from . import pipeline  # noqa: F401
+
+    fitz.open().close()
+    return os.getpid()
+
+
+class PipelineExecutor:
+    """Run CPU-bound pipeline calls without blocking the event loop.
+
+    In "process" mode, calls are dispatched to a pool of worker processes, so that
+    concurrent documents are parsed on several cores. In "inline" mode, calls are run
+    directly in the event loop, as a plain function call.
+    """
+
+    modes = ("process", "inline")
+
+    def __init__(self, mode: str = "process", workers: Optional[int] = None, max_jobs: Optional[int] = None):
+        if mode not in self.modes:
+            raise ValueError(f"unknown execution mode '{mode}', expected one of {self.modes}")
+        self.mode = mode
+        self.workers = workers or os.cpu_count() or 1
+        self.max_jobs = max_jobs or 4 * self.workers
+        self.jobs = 0  # jobs in flight, running or queued
+        self.pool = None
+
+    def start(self) -> None:
+        """Create the worker pool and wait for every worker to be ready.
+        """
+        if self.mode != "process" or self.pool is not None:
+            return
+        self.pool = ProcessPoolExecutor(max_workers=self.workers, initializer=init_document_worker)
+        wait([self.pool.submit(warm_up) for _ in range(self.workers)])
+
+    def shutdown(self) -> None:
+        if self.pool is not None:
+            self.pool.shutdown(wait=True)
+            self.pool = None
+
+    async def run(self, func: Callable, *args, **kwargs):
+        """Run `func(*args, **kwargs)` and return its result. Raise `QueueFullError`
+        if `max_jobs` calls are already in flight. In "process" mode, the executor must
+        have been started, since starting the pool blocks until every worker is ready.
+        """
+        if self.mode == "process" and self.pool is None:
+            raise RuntimeError("executor not started, call start() before run()")
+        if self.jobs >= self.max_jobs:
+            raise QueueFullError(f"{self.jobs} jobs already in flight")
+
+        self.jobs += 1
+        try:
+            if self.mode == "inline":
+                return func(*args, **kwargs)
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self.pool, partial(func, *args, **kwargs))
+        finally:
+            self.jobs -= 1
@@ -0,0 +1,56 @@
+from typing import Iterable, List, NamedTuple, Optional
+
+
+class Field(NamedTuple):
+    group: str  # attribute of `Ipid` holding the field
+    name: str  # attribute of the group model
+    section: Optional[str]  # key of the header starting the field in `parser.regex_field`
+    profile: str  # post-processing profile: "text" or "list" (each item is cleaned)
+
+
+# every field of the `Ipid` template, in extraction order
+FIELDS = [
+    # coverage
+    Field("coverage", "always_covered", "always_covered", "text"),
+    Field("coverage", "optionally_covered", "optionally_covered", "text"),
+    Field("coverage", "not_covered", "not_covered", "text"),
+    Field("coverage", "exclusions", "exclusions", "text"),
+    Field("coverage", "services", "services", "text"),
+
+    # applicability
+    Field("applicability", "obligations", "obligations", "text"),
+    Field("applicability", "localization", "localization", "text"),
+    Field("applicability", "payment_options", "payment_options", "text"),
+    Field("applicability", "start_date", "start_date", "text"),
+    Field("applicability", "termination", "termination", "text"),
+
+    # product
+    Field("product", "description", "description", "text"),
+    Field("product", "product", None, "text"),
+    Field("product", "typology", None, "text"),
+
+    # insurer
+    Field("insurer", "name", None, "text"),
+    Field("insurer", "siren", None, "list"),
+]
+
+FIELDS_BY_SECTION = {field.section: field for field in FIELDS if field.section}
+
+
+def select_fields(names: Optional[Iterable[str]] = None) -> List[Field]:
+    """Return the fields matching `names`, which are either groups (e.g. "insurer") or
+    fields (e.g. "exclusions" or "coverage.exclusions"). Return all fields if `names`
+    is None.
+    """
+    if names is None:
+        return list(FIELDS)
+
+    names = set(names)
+    selected = [field for field in FIELDS if names & {field.group, field.name, f"{field.group}.{field.name}"}]
+    known = {name for field in FIELDS for name in (field.group, field.name, f"{field.group}.{field.name}")}
+    unknown = names - known
+    if unknown:
+        raise ValueError(f"unknown fields: {', '.join(sorted(unknown))}")
+
+    return selected
+
@@ -0,0 +1,95 @@
+import hashlib
+import re
+from typing import Dict, Iterable, List, Match, Optional
+
+# non-exhaustive list, used when no insurer dictionary is given
+DEFAULT_INSURERS = ["AXA", "AG2R", "MATMUT", "GROUPAMA"]
+
+# SIREN exempt from the Luhn checksum
+LA_POSTE_SIREN = "356000000"
+
+non_digit_regex = re.compile(r"\D")
+
+
+def normalize(name: str) -> str:
+    return " ".join(name.split()).casefold()
+
+
+def load_insurers(path: Optional[str] = None) -> List[str]:
+    """Insurer names from a text file with one name per line (blank lines and lines
+    starting with "#" are ignored), or the default list if `path` is None.
+    """
+    if path is None:
+        return list(DEFAULT_INSURERS)
+    with open(path, encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip() and not line.lstrip().startswith("#")]
+
+
+def trie_pattern(names: Iterable[str]) -> str:
+    """Regex pattern matching any of `names`, structured as a trie of their characters, so
+    that the regex engine follows a single branch per character instead of trying each
+    name in turn. Whitespace in names matches any run of whitespace.
+    """
+    trie = {}
+    for name in names:
+        node = trie
+        for char in name:
+            node = node.setdefault(char, {})
+        node[""] = {}  # end of a name
+    return _node_pattern(trie)
+
+
+def _node_pattern(node: dict) -> str:
+    end = "" in node
+    branches = [(r"\s+" if char == " " else re.escape(char)) + _node_pattern(child)
+                for char, child in sorted(node.items()) if char]
+    if not branches:
+        return ""
+    if len(branches) == 1 and not end:
+        return branches[0]
+    return "(?:" + "|".join(branches) + ")" + ("?" if end else "")
+
+
+class InsurerMatcher:
+    """Find the first insurer name of a dictionary in a text, in a single scan whatever
+    the size of the dictionary. Names are matched case-insensitively, as whole words.
+    """
+
+    def __init__(self, names: Iterable[str]):
+        self.names: Dict[str, str] = {normalize(name): name.upper() for name in names if name.strip()}
+        pattern = trie_pattern(self.names) if self.names else r"(?!)"
+        self.regex = re.compile(r"(?<!\w)" + pattern + r"(?!\w)", re.IGNORECASE)
+        self.digest = hashlib.sha256("\n".join(sorted(self.names)).encode()).hexdigest()[:12]
+
+    def find(self, text: str) -> Optional[Match]:
+        """First insurer name found in `text`, as a regex match, or None if none."""
+        return self.regex.search(text)
+
+    def insurer(self, match: Match) -> str:
+        """Name of the insurer matched by `find`, in uppercase letters."""
+        return self.names.get(normalize(match.group(0)), match.group(0).upper())
+
+    def search(self, text: str) -> str:
+        """Name of the first insurer found in `text`, in uppercase letters, or "" if none."""
+        match = self.find(text)
+        if match is None:
+            return ""
+        return self.insurer(match)
+
+
+def luhn_valid(digits: str) -> bool:
+    """Whether `digits` pass the Luhn checksum, as SIREN numbers do (except La Poste's)."""
+    total = 0
+    for i, digit in enumerate(reversed(digits)):
+        n = int(digit) * (2 if i % 2 else 1)
+        total += n - 9 if n > 9 else n
+    return total % 10 == 0
+
+
+def siren_digits(siren: str) -> str:
+    return non_digit_regex.sub("", siren)
+
+
+def siren_valid(siren: str) -> bool:
+    digits = siren_digits(siren)
+    return len(digits) == 9 and (luhn_valid(digits) or digits == LA_POSTE_SIREN)
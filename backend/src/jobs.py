@@ -0,0 +1,158 @@
+import asyncio
+import os
+import sqlite3
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional
+
+from .cache import ResultCache, parse_cached
+from .executor import PipelineExecutor, QueueFullError
+from .metrics import Metrics
+from .template import Ipid, Job
+
+
+class JobStoreFullError(Exception):
+    """Raised when the maximum number of jobs is reached and none can be evicted."""
+
+
+class JobStore:
+    """State of asynchronous parsing jobs, in a SQLite database: in memory by default,
+    or in a file at `path` shared by several server processes. Queries run in a dedicated
+    thread, so that waiting for the lock of a shared file does not block the event loop.
+
+    Finished jobs expire `ttl` seconds after their last update, and at most `max_jobs` jobs
+    are kept: the oldest finished jobs are evicted first. Pending and running jobs are kept.
+    """
+
+    def __init__(self, path: Optional[str] = None, ttl: float = 3600, max_jobs: int = 1000):
+        self.ttl = ttl
+        self.max_jobs = max_jobs
+        self.db = sqlite3.connect(path or ":memory:", timeout=30, check_same_thread=False)
+        if path:
+            self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("CREATE TABLE IF NOT EXISTS jobs (id TEXT PRIMARY KEY, status TEXT NOT NULL, "
+                        "filename TEXT NOT NULL, created REAL NOT NULL, updated REAL NOT NULL, "
+                        "ipid TEXT, error TEXT)")
+        self.db.execute("CREATE INDEX IF NOT EXISTS jobs_updated ON jobs (updated)")
+        self.db.commit()
+        self.io = ThreadPoolExecutor(max_workers=1)  # a single thread uses the connection
+
+    async def create(self, filename: str = "") -> Job:
+        """Register a new pending job. Raise `JobStoreFullError` if `max_jobs` jobs are
+        pending or running.
+        """
+        return await self._run(self._create, filename)
+
+    async def update(self, job_id: str, status: str, ipid: Optional[Ipid] = None, error: Optional[str] = None) -> None:
+        await self._run(self._update, job_id, status, ipid, error)
+
+    async def get(self, job_id: str) -> Optional[Job]:
+        return await self._run(self._get, job_id)
+
+    async def stats(self) -> dict:
+        return await self._run(self._stats)
+
+    async def _run(self, func: Callable, *args):
+        """Run a query in the thread of the store."""
+        return await asyncio.get_running_loop().run_in_executor(self.io, func, *args)
+
+    def _create(self, filename: str) -> Job:
+        now = time.time()
+        job = Job(id=uuid.uuid4().hex, status="pending", filename=filename, created=now, updated=now)
+        self.evict(now)
+        count, = self.db.execute("SELECT COUNT(*) FROM jobs").fetchone()
+        if count >= self.max_jobs:
+            # evict the oldest finished jobs
+            self.db.execute("DELETE FROM jobs WHERE id IN (SELECT id FROM jobs WHERE status IN ('done', 'failed') "
+                            "ORDER BY updated LIMIT ?)", (count - self.max_jobs + 1,))
+            count, = self.db.execute("SELECT COUNT(*) FROM jobs").fetchone()
+            if count >= self.max_jobs:
+                self.db.commit()
+                raise JobStoreFullError(f"{count} jobs pending or running")
+        self.db.execute("INSERT INTO jobs (id, status, filename, created, updated) VALUES (?, ?, ?, ?, ?)",
+                        (job.id, job.status, job.filename, job.created, job.updated))
+        self.db.commit()
+        return job
+
+    def _update(self, job_id: str, status: str, ipid: Optional[Ipid], error: Optional[str]) -> None:
+        self.db.execute("UPDATE jobs SET status = ?, updated = ?, ipid = ?, error = ? WHERE id = ?",
+                        (status, time.time(), ipid.json() if ipid is not None else None, error, job_id))
+        self.db.commit()
+
+    def _get(self, job_id: str) -> Optional[Job]:
+        row = self.db.execute("SELECT id, status, filename, created, updated, ipid, error FROM jobs WHERE id = ? "
+                              "AND (updated >= ? OR status NOT IN ('done', 'failed'))",
+                              (job_id, time.time() - self.ttl)).fetchone()
+        if row is None:
+            return None
+        job_id, status, filename, created, updated, ipid, error = row
+        return Job(id=job_id, status=status, filename=filename, created=created, updated=updated,
+                   ipid=Ipid.parse_raw(ipid) if ipid else None, error=error)
+
+    def _stats(self) -> dict:
+        return dict(self.db.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+
+    def evict(self, now: Optional[float] = None) -> None:
+        """Delete the finished jobs which expired."""
+        self.db.execute("DELETE FROM jobs WHERE status IN ('done', 'failed') AND updated < ?",
+                        ((now or time.time()) - self.ttl,))
+
+
+class JobRunner:
+    """Run pending jobs in the background, with at most `concurrency` of them in flight.
+
+    Each job parses a spooled pdf file with `executor` (through `cache`), stores the
+    result or error in `store`, and removes the file.
+    """
+
+    def __init__(self, store: JobStore, executor: PipelineExecutor, cache: ResultCache, concurrency: int,
+                 metrics: Optional[Metrics] = None, settings: Optional[dict] = None):
+        self.store = store
+        self.executor = executor
+        self.cache = cache
+        self.concurrency = concurrency
+        self.metrics = metrics
+        self.settings = settings
+        self.queue = None  # created in the event loop, by `start`
+        self.tasks: List[asyncio.Task] = []
+
+    def start(self) -> None:
+        if not self.tasks:
+            self.queue = asyncio.Queue()
+            self.tasks = [asyncio.ensure_future(self.work()) for _ in range(self.concurrency)]
+
+    async def shutdown(self) -> None:
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.tasks = []
+
+    def submit(self, job: Job, path: str, digest: str, **options) -> None:
+        self.start()
+        self.queue.put_nowait((job.id, path, digest, options))
+
+    async def work(self) -> None:
+        while True:
+            job_id, path, digest, options = await self.queue.get()
+            try:
+                await self.run(job_id, path, digest, **options)
+            finally:
+                self.queue.task_done()
+
+    async def run(self, job_id: str, path: str, digest: str, **options) -> None:
+        await self.store.update(job_id, "running")
+        try:
+            while True:
+                try:
+                    ipid = await parse_cached(self.executor, self.cache, path, digest=digest, metrics=self.metrics,
+                                              settings=self.settings, **options)
+                    break
+                except QueueFullError:  # the executor is busy with synchronous requests
+                    await asyncio.sleep(0.1)
+        except Exception as e:
+            await self.store.update(job_id, "failed", error=f"{type(e).__name__}: {e}")
+        else:
+            await self.store.update(job_id, "done", ipid=ipid)
+        finally:
+            os.remove(path)
@@ -0,0 +1,93 @@
+from itertools import groupby
+from operator import itemgetter
+from typing import List, Tuple
+
+import numpy as np
+from fitz import Page, Rect
+
+from .word_recovery import VectorizedWordRecovery, word_arrays
+
+word_recovery = VectorizedWordRecovery()
+
+
+def find_gutters(boxes: np.ndarray, min_gap: float = 10.0, tolerance: float = 0.1) -> List[Tuple[float, float]]:
+    """Find the vertical gutters between columns of text, given the (N, 4) boxes of the
+    text lines of a page. A gutter is a band of at least `min_gap` points, crossed by at
+    most a fraction `tolerance` of the lines (e.g. titles spanning several columns), with
+    text on both sides. Return the (start, end) x coordinates of each gutter.
+    """
+    if len(boxes) == 0:
+        return []
+
+    # number of lines covering each 1 point wide band of the page, from the leftmost text
+    origin = np.floor(boxes[:, 0].min())
+    x0 = (np.floor(boxes[:, 0]) - origin).astype(int)
+    x1 = (np.ceil(boxes[:, 2]) - origin).astype(int)
+    coverage = np.zeros(x1.max() + 1, dtype=int)
+    np.add.at(coverage, x0, 1)
+    np.add.at(coverage, x1, -1)
+    coverage = np.cumsum(coverage)[:-1]
+
+    # runs of low coverage, which are not at the edges of the text
+    low = np.concatenate([[False], coverage <= tolerance * len(boxes), [False]]).astype(int)
+    starts, ends = np.flatnonzero(np.diff(low) == 1), np.flatnonzero(np.diff(low) == -1)
+    return [(origin + start, origin + end) for start, end in zip(starts.tolist(), ends.tolist())
+            if end - start >= min_gap and start > 0 and end < len(coverage)]
+
+
+def lines_text(words: list) -> str:
+    """Join words recovered by `WordRecovery` ([x0, y0, x1, y1, "word", line]) into lines.
+    """
+    words = sorted(words, key=itemgetter(5, 0))
+    return "".join(" ".join(w[4] for w in line) + "\n" for _, line in groupby(words, key=itemgetter(5)))
+
+
+def layout_text(page: Page, min_gap: float = 10.0, tolerance: float = 0.1) -> str:
+    """Extract the text of `page` in reading order, column by column.
+
+    Words are extracted once, grouped into the text lines found by MuPDF, and lines are
+    assigned to the columns delimited by gutters. Going down the page, lines spanning
+    several columns (e.g. titles) are output as they come, while the lines in between are
+    output column after column. The words of each column are ordered by `WordRecovery`.
+    """
+    words = page.get_text("words")  # x0, y0, x1, y1, "word", block, line, word number
+    if not words:
+        return ""
+
+    # text lines, as found by MuPDF
+    lines = [list(line) for _, line in groupby(sorted(words, key=itemgetter(5, 6, 7)), key=itemgetter(5, 6))]
+    boxes = np.array([[min(w[0] for w in line), min(w[1] for w in line),
+                       max(w[2] for w in line), max(w[3] for w in line)] for line in lines])
+    gutters = np.array(find_gutters(boxes, min_gap=min_gap, tolerance=tolerance)).reshape(-1, 2)
+    starts, ends = gutters[:, 0], gutters[:, 1]
+
+    # column of each line, -1 for lines spanning a gutter: crossing it from one column into
+    # the next, not just overhanging its middle
+    columns = np.searchsorted((starts + ends) / 2, (boxes[:, 0] + boxes[:, 2]) / 2)
+    spanning = ((boxes[:, 0, None] <= starts) & (boxes[:, 2, None] >= ends)).any(axis=1)
+    columns[spanning] = -1
+
+    text = []
+    band = []  # lines between two spanning lines
+    for i in np.lexsort((boxes[:, 0], boxes[:, 1])).tolist():
+        if columns[i] >= 0:
+            band.append(i)
+            continue
+        text.extend(_band_text(lines, columns, band))
+        text.append(lines_text(word_recovery([list(w[:5]) for w in lines[i]], page.rect)))
+        band = []
+    text.extend(_band_text(lines, columns, band))
+
+    return "".join(text)
+
+
+def _band_text(lines: list, columns: np.ndarray, band: List[int]) -> List[str]:
+    """Text of each column of a band of lines, from left to right.
+    """
+    text = []
+    for _, indices in groupby(sorted(band, key=lambda i: columns[i]), key=lambda i: columns[i]):
+        words = [list(w[:5]) for i in indices for w in lines[i]]
+        boxes, _ = word_arrays(words)
+        rect = Rect(boxes[:, 0].min(), boxes[:, 1].min(), boxes[:, 2].max(), boxes[:, 3].max())
+        text.append(lines_text(word_recovery(words, rect)))
+    return text
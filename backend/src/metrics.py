@@ -0,0 +1,112 @@
+from bisect import bisect_left
+from typing import Dict, List, Sequence, Tuple
+
+from .template import Metadata
+
+# histogram buckets
+DURATION_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+PAGE_BUCKETS = (1, 2, 3, 5, 10, 20, 50, 100)
+SIZE_BUCKETS = (1e4, 5e4, 1e5, 5e5, 1e6, 5e6, 1e7, 5e7)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+class Histogram:
+    """Histogram of observed values, split by labels, in the Prometheus data model:
+    cumulative counts per bucket upper bound, with the sum and count of all values.
+    """
+
+    def __init__(self, name: str, help: str, buckets: Sequence[float]):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(buckets)
+        self.series = {}  # labels -> [count per bucket (last is +Inf), sum]
+
+    def observe(self, value: float, **labels) -> None:
+        key = tuple(sorted(labels.items()))
+        counts, total = self.series.get(key) or ([0] * (len(self.buckets) + 1), 0.0)
+        counts[bisect_left(self.buckets, value)] += 1
+        self.series[key] = [counts, total + value]
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for key, (counts, total) in sorted(self.series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_labels(key + (('le', _number(bound)),))} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(key)} {total}")
+            lines.append(f"{self.name}_count{_labels(key)} {cumulative}")
+        return lines
+
+
+class Metrics:
+    """Latency and volume metrics of the service, rendered in the Prometheus text format.
+
+    Documents are observed from the metadata of their parsed `Ipid` (stage and field
+    timings, pages and size), as they are parsed in worker processes.
+    """
+
+    def __init__(self):
+        self.requests = Histogram("ipid_request_duration_seconds", "Duration of HTTP requests.", DURATION_BUCKETS)
+        self.documents = Histogram("ipid_document_duration_seconds", "Duration of the parsing pipeline.",
+                                   DURATION_BUCKETS)
+        self.stages = Histogram("ipid_stage_duration_seconds", "Duration of each stage of the parsing pipeline.",
+                                DURATION_BUCKETS)
+        self.fields = Histogram("ipid_field_duration_seconds", "Duration of the extraction of each field.",
+                                DURATION_BUCKETS)
+        self.pages = Histogram("ipid_document_pages", "Pages in each parsed document.", PAGE_BUCKETS)
+        self.pages_processed = Histogram("ipid_document_pages_processed", "Pages read in each parsed document.",
+                                         PAGE_BUCKETS)
+        self.sizes = Histogram("ipid_document_bytes", "Size of each parsed document.", SIZE_BUCKETS)
+
+    def observe_request(self, method: str, path: str, status: int, seconds: float) -> None:
+        self.requests.observe(seconds, method=method, path=path, status=str(status))
+
+    def observe_document(self, metadata: Metadata) -> None:
+        self.documents.observe(sum(metadata.timings.values()))
+        for stage, seconds in metadata.timings.items():
+            self.stages.observe(seconds, stage=stage)
+        for field, seconds in metadata.field_timings.items():
+            self.fields.observe(seconds, field=field)
+        self.pages.observe(metadata.pages)
+        self.pages_processed.observe(metadata.pages_processed)
+        self.sizes.observe(metadata.size)
+
+    def render(self, gauges: Dict[str, float] = None) -> str:
+        """Render all histograms, followed by `gauges` (e.g. cache counters), as
+        Prometheus text.
+        """
+        lines = []
+        for histogram in (self.requests, self.documents, self.stages, self.fields,
+                          self.pages, self.pages_processed, self.sizes):
+            lines.extend(histogram.render())
+        for name, value in (gauges or {}).items():
+            lines.extend([f"# TYPE {name} gauge", f"{name} {value}"])
+        return "\n".join(lines) + "\n"
+
+
+def timing_header(metadata: Metadata) -> str:
+    """Breakdown of the stages of a parsed document, in milliseconds, for the `X-Timing`
+    response header (e.g. "read;dur=0.1, extract;dur=4.2, parse;dur=0.5"), or "cache;desc=hit"
+    if the result was served from the cache.
+    """
+    if metadata.cached:
+        return "cache;desc=hit"
+    return ", ".join(f"{stage};dur={seconds * 1000:.3f}" for stage, seconds in metadata.timings.items())
+
+
+def _labels(labels: Labels) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels) + "}"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value))
@@ -0,0 +1,87 @@
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from .reader import DEFAULT_STORE_SIZE, open_pdf, read_text
+
+# pools of the current process, by number of workers
+pools: Dict[Tuple[int, int], ProcessPoolExecutor] = {}
+
+# set in the worker processes of pools parsing documents, see `init_document_worker`
+document_worker = False
+
+
+def init_document_worker() -> None:
+    """Initializer of the worker processes of pools parsing documents (`PipelineExecutor`
+    and `bulk.py` workers). Documents are already parsed in parallel there, so these
+    processes do not start pools of their own.
+    """
+    global document_worker
+    document_worker = True
+
+
+def in_document_worker() -> bool:
+    """Whether this process is a worker of a pool parsing documents, where pages may not
+    be extracted in parallel. Other processes, e.g. the workers of a web server, may.
+    """
+    return document_worker
+
+
+def get_pool(workers: int) -> ProcessPoolExecutor:
+    """Pool of `workers` processes extracting page texts, created once per process.
+    """
+    key = (workers, os.getpid())
+    if key not in pools:
+        pools[key] = ProcessPoolExecutor(max_workers=workers)
+    return pools[key]
+
+
+def extract_range(path: str, start: int, stop: int, layout: bool = False,
+                  store_size: Optional[int] = DEFAULT_STORE_SIZE) -> List[str]:
+    """Text of pages `start` to `stop` (excluded) of the pdf at `path`, in a worker process.
+    """
+    with open_pdf(path, store_size=store_size) as document:
+        return [read_text(document[number], layout=layout) for number in range(start, stop)]
+
+
+@contextmanager
+def shared_file(path):
+    """Path of a pdf that worker processes can open: `path` itself, or a temporary copy
+    if `path` is the content of the pdf.
+    """
+    if not isinstance(path, (bytes, bytearray)):
+        yield path
+        return
+    fd, name = tempfile.mkstemp(suffix=".pdf")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(path)
+        yield name
+    finally:
+        os.remove(name)
+
+
+def parallel_texts(path, page_count: int, workers: int, chunk: Optional[int] = None,
+                   layout: bool = False, store_size: Optional[int] = DEFAULT_STORE_SIZE) -> Iterator[str]:
+    """Extract the text of the `page_count` first pages of a pdf (its path or content) with
+    `workers` processes, each opening the document and extracting a range of `chunk` pages,
+    and yield texts in page order. Ranges not yet started are cancelled if the iteration
+    stops early.
+    """
+    chunk = chunk or max(1, -(-page_count // (4 * workers)))  # a few ranges per worker, to balance them
+    pool = get_pool(workers)
+    with shared_file(path) as name:
+        futures = [pool.submit(extract_range, name, start, min(start + chunk, page_count), layout,
+                               store_size)
+                   for start in range(0, page_count, chunk)]
+        try:
+            for future in futures:
+                yield from future.result()
+        finally:
+            for future in futures:
+                future.cancel()
+            for future in futures:  # the file is removed once no worker reads it
+                if not future.cancelled():
+                    future.exception()
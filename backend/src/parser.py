@@ -1,10 +1,15 @@
-import copy
+import os
 import re
-from typing import List
+import time
+from bisect import bisect_right
+from typing import Iterable, List, Match, Optional
 
 from fitz.fitz import Page
 
-from .template import Ipid
+from .fields import FIELDS_BY_SECTION, select_fields
+from .insurers import InsurerMatcher, load_insurers, siren_digits, siren_valid
+from .segmenter import Chunk, SectionStream, Segmenter
+from .template import IpidBuilder
 
 ## regex
 
@@ -34,96 +39,211 @@ siren_regex = re.compile(r"\b(?:\d\s?){9}\b", re.IGNORECASE)
 typology_regex = re.compile(r"([^\n]+)\n", re.IGNORECASE)
 product_regex = re.compile(r"produit\s?:([^\n]+)\n", re.IGNORECASE)
 
-# non-exhaustive list
-insurer_name_regex = re.compile(r"\b(axa|ag2r|matmut|groupama)\b", re.IGNORECASE)
+# insurer dictionary, one name per line in the file at INSURERS_PATH (a short default list otherwise)
+insurer_matcher = InsurerMatcher(load_insurers(os.environ.get("INSURERS_PATH")))
+
+# all section headers, compiled once into a single pattern
+segmenter = Segmenter(regex_field)
+
+# confidence in a field, from the way it was found
+confidence = {
+    "closed": 1.0,  # section followed by the header of another section
+    "open": 0.6,  # section running to the end of the page or document, which may hold unrelated text
+    "label": 0.9,  # product name, after its label
+    "first_line": 0.5,  # typology, the first line of the document
+    "dictionary": 0.9,  # insurer name, from the insurer dictionary
+    "checksum": 1.0,  # SIREN numbers, with a valid checksum
+}
 
 
 class Parser:
 
-    def parse_document(self, template: Ipid, page: Page) -> Ipid:
+    def __init__(self, fields: Optional[Iterable[str]] = None):
+        """Parse the `fields` of the template (see `fields.select_fields`), all by default.
+        Sections are only extracted if at least one of them is requested.
+        """
+        self.fields = select_fields(fields)
+        self.sections = [field.section for field in self.fields if field.section]
+        self.entities = {field.name for field in self.fields if not field.section}
+        self.timings = {}  # seconds spent extracting sections (all at once) and each other field
+        self.page = -1  # index of the page being parsed
+
+    def parse_document(self, template: IpidBuilder, page: Page) -> IpidBuilder:
 
         # process page
-        text = page.get_text("text")
-
-        # extract coverage
-        template.coverage.always_covered += self.parse_field(text, "always_covered")
-        template.coverage.optionally_covered += self.parse_field(text, "optionally_covered")
-        template.coverage.not_covered += self.parse_field(text, "not_covered")
-        template.coverage.exclusions += self.parse_field(text, "exclusions")
-        template.coverage.services += self.parse_field(text, "services")
-
-        # extract applicability
-        template.applicability.obligations += self.parse_field(text, "obligations")
-        template.applicability.localization += self.parse_field(text, "localization")
-        template.applicability.payment_options += self.parse_field(text, "payment_options")
-        template.applicability.start_date += self.parse_field(text, "start_date")
-        template.applicability.termination += self.parse_field(text, "termination")
+        return self.parse_text(template, page.get_text("text"))
+
+    def parse_text(self, template: IpidBuilder, text: str) -> IpidBuilder:
+        """Parse the `text` of a single page, the next page of the document.
+        """
+        self.page += 1
+
+        # extract coverage, applicability and product description
+        if self.sections:
+            start = time.perf_counter()
+            spans = segmenter.locate(text, sections=self.sections)
+            for section, span in spans.items():
+                if span is None:
+                    continue
+                name = FIELDS_BY_SECTION[section].name
+                self.append_section(template, section, text[span.start:span.end])
+                template.add_source(name, self.page, span.start, span.end,
+                                    confidence["closed" if span.closed else "open"],
+                                    header=text[span.header.start:span.header.end])
+                template.resolved.add(name)  # sections do not continue on next pages
+            self.add_timing("sections", start)
+
+        return self.parse_entities(template, text)
+
+    def parse_stream(self, template: IpidBuilder, texts: Iterable[str]) -> IpidBuilder:
+        """Parse the `texts` of all pages of a document, assembling each section across page
+        breaks: text at the top of a page belongs to the last section opened on a previous page.
+        """
+        stream = SectionStream(segmenter)
+        starts = []  # offset of each page in the text of the whole document
+        for text in texts:
+            self.page += 1
+            starts.append(stream.offset + len(stream.pending))
+            if self.sections:
+                start = time.perf_counter()
+                for chunk in stream.feed(text):
+                    self.append_chunk(template, chunk, starts, closed=chunk.section in stream.closed)
+
+                # a section is resolved only once closed by another header: an open section
+                # may continue on any later page, up to `max_pages`
+                template.resolved.update(FIELDS_BY_SECTION[section].name for section in stream.closed
+                                         if section in self.sections)
+                self.add_timing("sections", start)
+            template = self.parse_entities(template, text)
+
+        for chunk in stream.close():
+            self.append_chunk(template, chunk, starts, closed=chunk.section in stream.closed)
+
+        return template
 
+    def append_chunk(self, template: IpidBuilder, chunk: Chunk, starts: List[int], closed: bool) -> None:
+        """Append a `chunk` of a section stream to its field, and record the pages it spans,
+        given the offset of each page in the text of the document (`starts`).
+        """
+        if chunk.section not in self.sections:
+            return
+        self.append_section(template, chunk.section, chunk.text)
+        if template.provenance is None:
+            return
+        start, end = chunk.start, chunk.start + len(chunk.text)
+        page = bisect_right(starts, start) - 1
+        while start < end:
+            stop = min(end, starts[page + 1]) if page + 1 < len(starts) else end
+            if stop > start:  # empty pages have no text to point at
+                template.add_source(FIELDS_BY_SECTION[chunk.section].name, page, start - starts[page],
+                                    stop - starts[page], confidence["closed" if closed else "open"],
+                                    header=chunk.header)
+            start, page = stop, page + 1
+
+    def append_section(self, template: IpidBuilder, section: str, chunk: str) -> None:
+        """Append `chunk` to the field of `template` corresponding to `section`,
+        if that field is requested.
+        """
+        if section not in self.sections:
+            return
+        template.append(FIELDS_BY_SECTION[section].name, chunk)
+
+    def parse_entities(self, template: IpidBuilder, text: str) -> IpidBuilder:
+        """Extract fields that are not delimited by a section header from the `text`
+        of a page: product name, typology and insurer. A field is resolved once found.
+        """
         # product extraction
-        template.product.description += self.parse_field(text, "description")
-        template.product.product += self.product_search(text)
-        template.product.typology = self.typology_search(text=text, existing_field=template.product.typology)
+        if "product" in self.entities:
+            start = time.perf_counter()
+            match = self.product_match(text)
+            template.append("product", match.group(1).strip() if match else "")
+            if match:
+                template.add_source("product", self.page, *match.span(1), confidence["label"])
+            self.add_timing("product", start)
+        if "typology" in self.entities and not template.text("typology"):
+            start = time.perf_counter()
+            match = typology_regex.search(text)
+            template.set("typology", match.group(1).strip() if match else "")
+            if match:
+                template.add_source("typology", self.page, *match.span(1), confidence["first_line"])
+            self.add_timing("typology", start)
 
         # insurer extraction
-        template.insurer.name = self.insurer_name_search(text=text, existing_field=template.insurer.name)
-        template.insurer.siren.extend(self.siren_search(text))
+        if "name" in self.entities and not template.text("name"):
+            start = time.perf_counter()
+            match = insurer_matcher.find(text)
+            template.set("name", insurer_matcher.insurer(match) if match else "")
+            if match:
+                template.add_source("name", self.page, *match.span(), confidence["dictionary"])
+            self.add_timing("name", start)
+        if "siren" in self.entities:
+            start = time.perf_counter()
+            seen = {siren_digits(siren) for siren in template.items("siren")}
+            for match in self.siren_matches(text):
+                if siren_digits(match.group(0)) not in seen:
+                    template.append("siren", match.group(0))
+                    template.add_source("siren", self.page, *match.span(), confidence["checksum"])
+            self.add_timing("siren", start)
 
+        for name in self.entities:
+            if any(template.items(name)):
+                template.resolved.add(name)
         return template
 
+    def add_timing(self, name: str, start: float) -> None:
+        """Add the time elapsed since `start` (from `time.perf_counter`) to the timing of `name`.
+        """
+        self.timings[name] = self.timings.get(name, 0.0) + time.perf_counter() - start
+
+    def is_complete(self, template: IpidBuilder) -> bool:
+        """Whether all requested fields are resolved, so that later pages can be skipped.
+        """
+        return all(field.name in template.resolved for field in self.fields)
+
     @staticmethod
     def parse_field(text: str, starting_field: str) -> str:
         """Extract relevant paragraph from `text`. First, detect beginning of text
         to extract by looking for `starting_field`, and then stops when any other field
         is detected. If no starting nor ending field is detected, return empty string.
         """
-        # starting field
-        match_start = regex_field[starting_field].search(text)
-
-        # ending fields
-        remaining_regex = copy.deepcopy(regex_field)
-        del remaining_regex[starting_field]
-        ending_regex = re.compile('|'.join([x.pattern for x in list(remaining_regex.values())]), re.IGNORECASE)
-        
-        matches_end = [(text[x.span()[0]:x.span()[1]], x.span()[0], x.span()[1]) for x in re.finditer(ending_regex, text)]
-        matches_end = sorted(matches_end, key = lambda x: x[1])
-        
-        if not match_start:
-            return ""
-        
-        if not matches_end:
-            return text[match_start.span()[1]:]
-        
-        for match_end in matches_end:
-            
-            if match_start.span()[1] < match_end[1]:
-                parsed_text = text[match_start.span()[1]:match_end[1]]
-                return parsed_text
-
-        return text[match_start.span()[1]:]
+        return segmenter.extract(text, sections=[starting_field])[starting_field]
+
+    @staticmethod
+    def product_match(text: str) -> Optional[Match]:
+        """Find the product name, after its label, as the first group of a regex match.
+        """
+        return product_regex.search(text)
 
     @staticmethod
     def product_search(text: str) -> str:
         """Parse product name using a regex search. If nothing is found,
         return an empty string.
         """
-        match = re.search(product_regex, text)
+        match = Parser.product_match(text)
         if match:
             output = match.group(1).strip()
         else:
             output = ""
         return output
 
+    @staticmethod
+    def siren_matches(text: str) -> List[Match]:
+        """Find SIREN numbers by regex search, keeping those with a valid checksum and
+        the first of numbers with the same digits.
+        """
+        sirens = {}
+        for match in siren_regex.finditer(text):
+            if siren_valid(match.group(0)):
+                sirens.setdefault(siren_digits(match.group(0)), match)
+        return list(sirens.values())
+
     @staticmethod
     def siren_search(text: str) -> List[str]:
-        """Parse SIREN number by simple regex search. There can be several SIREN
-        numbers, thus we return a list.
+        """Parse SIREN numbers by regex search, keeping those with a valid checksum.
+        There can be several SIREN numbers, thus we return a list, without duplicates
+        (numbers with the same digits).
         """
-        match = re.finditer(siren_regex, text)
-        if not match:
-            sirens = []
-        else:
-            sirens = [text[x.span()[0]:x.span()[1]] for x in match]
-        return sirens
+        return [match.group(0) for match in Parser.siren_matches(text)]
 
     @staticmethod
     def typology_search(text: str, existing_field: str) -> str:
@@ -148,10 +268,4 @@ class Parser:
         """
         if len(existing_field) > 0:
             return existing_field
-        else:
-            match = re.search(insurer_name_regex, text)
-            if match:
-                output = match.group(0).strip().upper()
-            else:
-                output = ""
-        return output
+        return insurer_matcher.search(text)
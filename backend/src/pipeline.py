@@ -1,31 +1,215 @@
-from .parser import Parser
+import hashlib
+import inspect
+import os
+import time
+from contextlib import ExitStack
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from fitz import Page
+
+from .classifier import classify, classify_text
+from .fields import select_fields
+from .insurers import InsurerMatcher
+from .parallel import in_document_worker, parallel_texts
+from .parser import Parser, insurer_matcher
 from .post_processing import PostProcessing
-from .reader import read_pdf
-from .template import Ipid
+from .reader import DEFAULT_STORE_SIZE, get_pdf_metadata, open_pdf, read_text
+from .segmenter import Segmenter
+from .template import Ipid, IpidBuilder
+from .text_store import StoredDocument, open_text_store
+
+
+def rules_version() -> str:
+    """Version stamp of the extraction rules. It changes whenever the code of the field registry,
+    parser, segmenter, post-processing or template changes, e.g. when a regex is tuned, or
+    when the insurer dictionary changes.
+    """
+    digest = hashlib.sha256()
+    for rule in (select_fields, classify, Parser, InsurerMatcher, Segmenter, PostProcessing, Ipid):
+        digest.update(inspect.getsource(inspect.getmodule(rule)).encode())
+    digest.update(insurer_matcher.digest.encode())
+    return digest.hexdigest()[:12]
+
 
+RULES_VERSION = rules_version()
 
-def parse_document(path: str) -> Ipid:
+
+def iter_pages(pages: Iterable, page_count: int, parser: Parser, template: IpidBuilder,
+               early_exit: bool = False, max_pages: Optional[int] = None) -> Iterator:
+    """Iterate over the `page_count` pages of a document (pdf pages or their texts), counting
+    them in `template` metadata. Stop after `max_pages` pages or, with `early_exit`, as soon
+    as all fields are resolved.
+    """
+    template.metadata["pages"] = page_count
+    template.metadata["pages_processed"] = 0
+    for number, page in enumerate(pages):
+        if number == max_pages or (early_exit and parser.is_complete(template)):
+            return
+        template.metadata["pages_processed"] += 1
+        yield page
+
+
+def iter_texts(pages: Iterable[Page], timings: Dict[str, float], layout: bool = False,
+               known: Optional[Dict[int, str]] = None, extracted: Optional[List[str]] = None) -> Iterator[str]:
+    """Extract the text of each page of `pages`, adding the time spent to `timings`. Texts
+    already extracted are given by page number in `known`. Texts are appended to `extracted`,
+    if given.
+    """
+    timings.setdefault("extract", 0.0)
+    known = known or {}
+    for page in pages:
+        start = time.perf_counter()
+        text = known[page.number] if page.number in known else read_text(page, layout=layout)
+        timings["extract"] += time.perf_counter() - start
+        if extracted is not None:
+            extracted.append(text)
+        yield text
+
+
+def iter_timed(texts: Iterable[str], timings: Dict[str, float], extracted: Optional[List[str]] = None
+               ) -> Iterator[str]:
+    """Iterate over `texts` extracted by other processes, adding the time spent waiting
+    for them to `timings`. Texts are appended to `extracted`, if given.
+    """
+    timings.setdefault("extract", 0.0)
+    texts = iter(texts)
+    while True:
+        start = time.perf_counter()
+        text = next(texts, None)
+        timings["extract"] += time.perf_counter() - start
+        if text is None:
+            return
+        if extracted is not None:
+            extracted.append(text)
+        yield text
+
+
+def parse_document(path: Optional[str], streaming: bool = False, fields: Optional[List[str]] = None,
+                   early_exit: bool = False, max_pages: Optional[int] = None, layout: bool = False,
+                   classify_first: bool = True, text_store: Optional[str] = None,
+                   digest: Optional[str] = None, parallel_pages: Optional[int] = None,
+                   parallel_workers: Optional[int] = None,
+                   store_size: Optional[int] = DEFAULT_STORE_SIZE, provenance: bool = False) -> Ipid:
     """Parse a document and return extracted information in
     a Ipid template object.
 
     Args:
-        path (str): Path to pdf document.
+        path (str): Path to pdf document, or its content as bytes. It can be None
+            if the texts of the document are in `text_store`.
+        streaming (bool): Assemble sections across page breaks instead of
+            parsing each page independently.
+        fields (list): Groups or fields to extract (e.g. ["insurer", "product"]),
+            others are left empty. All fields are extracted by default.
+        early_exit (bool): Stop reading pages once every field is found and,
+            for sections, closed by the next section header.
+        max_pages (int): Maximum number of pages to read.
+        layout (bool): Extract the text of each page column by column, from the
+            position of words, instead of in the order of the pdf content.
+        classify_first (bool): Check that the document is an IPID from its first
+            page, and return an empty template if not.
+        text_store (str): Path to a `TextStore`. Page texts are read from it when
+            stored by a previous run, instead of being extracted from the pdf, and
+            stored otherwise.
+        digest (str): sha256 of the document, computed if needed and not given.
+        parallel_pages (int): Extract the pages of documents of at least this many
+            pages in parallel, with `parallel_workers` processes (one per core by
+            default), unless in a worker of a pool parsing documents. Disabled by default.
+        store_size (int): Empty the MuPDF store once the document is closed if it
+            holds more than this many bytes (see `reader.open_pdf`).
+        provenance (bool): Also return where each field was found: pages, spans
+            of their text, section header and a confidence.
 
     Returns:
         Ipid: Ipid template object with extracted fields.
     """
 
-    # 1. open pdf
-    document = read_pdf(path)
+    timings = {}
 
-    # 2. extract content
-    parser = Parser()
-    template = Ipid()
-    for page in document:
-        template = parser.parse_document(template, page)
+    with ExitStack() as resources:  # the pdf is closed once its pages are extracted
+        # 1. open pdf, unless its page texts are stored
+        start = time.perf_counter()
+        store, stored, document = None, None, None
+        if text_store is not None:
+            store = open_text_store(text_store)
+            digest = digest or file_digest(path)
+            stored = store.get(digest, layout=layout)
+            if stored is not None and not stored.covers(max_pages):
+                stored = None
+        if stored is None:
+            if path is None:
+                raise ValueError(f"no pdf given, and no stored texts for document {digest}")
+            document = resources.enter_context(open_pdf(path, store_size=store_size))
+            page_count = document.page_count
+            size = len(path) if isinstance(path, (bytes, bytearray)) else os.path.getsize(path)
+        else:
+            page_count, size = stored.page_count, stored.size
+        timings["read"] = time.perf_counter() - start
+        template = IpidBuilder(provenance=provenance)
+        template.metadata["size"] = size
 
-    # 3. post-processing
-    post_processor = PostProcessing()
+        # 2. reject documents which are not IPIDs
+        known = {}
+        if classify_first:
+            start = time.perf_counter()
+            if stored is None:
+                classification = classify(document)
+            else:
+                classification = classify_text(stored.texts[0] if stored.texts else "", page_count, stored.metadata)
+            timings["classify"] = time.perf_counter() - start
+            template.metadata.update(is_ipid=classification.is_ipid, confidence=classification.confidence)
+            if not classification.is_ipid:
+                if store is not None and stored is None and classification.text is not None and not layout:
+                    store.save(digest, StoredDocument(page_count, size, get_pdf_metadata(document),
+                                                      [classification.text]))
+                template.metadata.update(pages=page_count, timings=timings)
+                return template.to_ipid()
+            if not layout and stored is None:
+                known[0] = classification.text
+
+        # 3. extract content, or read it from the store
+        start = time.perf_counter()
+        parser = Parser(fields)
+        extracted = []
+        if stored is None and parallel_pages is not None and page_count >= parallel_pages and not in_document_worker():
+            # long documents: ranges of pages are extracted by several processes, in page order
+            stop = min(page_count, max_pages) if max_pages is not None else page_count
+            pages = parallel_texts(path, stop, workers=parallel_workers or os.cpu_count() or 1,
+                                   layout=layout, store_size=store_size)
+            pages = iter_pages(pages, page_count, parser, template, early_exit=early_exit, max_pages=max_pages)
+            texts = iter_timed(pages, timings, extracted=extracted)
+        elif stored is None:
+            pages = iter_pages(document, page_count, parser, template, early_exit=early_exit, max_pages=max_pages)
+            texts = iter_texts(pages, timings, layout=layout, known=known, extracted=extracted)
+        else:
+            texts = iter_pages(stored.texts, page_count, parser, template, early_exit=early_exit, max_pages=max_pages)
+            timings["extract"] = 0.0
+        if streaming:
+            template = parser.parse_stream(template, texts)
+        else:
+            for text in texts:
+                template = parser.parse_text(template, text)
+        timings["parse"] = time.perf_counter() - start - timings["extract"]
+
+        if store is not None and stored is None:
+            store.save(digest, StoredDocument(page_count, size, get_pdf_metadata(document), extracted), layout=layout)
+
+    # 4. post-processing
+    start = time.perf_counter()
+    post_processor = PostProcessing(fields)
     template = post_processor.process(template)
+    timings["post_processing"] = time.perf_counter() - start
+
+    template.metadata["timings"] = timings
+    template.metadata["field_timings"] = parser.timings
+    return template.to_ipid()
+
 
-    return template
+def file_digest(path) -> str:
+    """sha256 of a pdf, given its content or its path."""
+    if isinstance(path, (bytes, bytearray)):
+        return hashlib.sha256(path).hexdigest()
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
@@ -1,61 +1,67 @@
 import re
-from typing import List
+from typing import Iterable, List, Optional
 
-from pydantic import fields
-
-from .template import Ipid
+from .fields import select_fields
+from .template import IpidBuilder
 
 regex_not_new_line = re.compile(r"(\n)([\t\s]?[a-zàâäéèëêùûü])")
+regex_bullet = re.compile(r"[\?!✓\uf0fb]+")
+regex_dash = re.compile(r"-+(?: -+)?")  # pairs of dash runs become a single dash
+
+# joins texts cleaned in a single pass (it is neither whitespace nor punctuation)
+BATCH_SEPARATOR = "\x00"
 
 
 class PostProcessing:
 
-    def process(self, template: Ipid) -> Ipid:
+    def __init__(self, fields: Optional[Iterable[str]] = None):
+        """Post-process the `fields` of the template (see `fields.select_fields`), all by default.
+        """
+        self.fields = select_fields(fields)
+
+    def process(self, template: IpidBuilder) -> IpidBuilder:
         """Perform some post-processing to IPID template:
             - clean punctuation
             - return to line
             etc.
         """
-        ## iterate over all Template fields (did not find a way to iterate over BaseModel fields)
-
-        # coverage
-        template.coverage.always_covered = self._process(template.coverage.always_covered)
-        template.coverage.optionally_covered = self._process(template.coverage.optionally_covered)
-        template.coverage.not_covered = self._process(template.coverage.not_covered)
-        template.coverage.exclusions = self._process(template.coverage.exclusions)
-        template.coverage.services = self._process(template.coverage.services)
-
-        # applicability
-        template.applicability.obligations = self._process(template.applicability.obligations)
-        template.applicability.localization = self._process(template.applicability.localization)
-        template.applicability.payment_options = self._process(template.applicability.payment_options)
-        template.applicability.start_date = self._process(template.applicability.start_date)
-        template.applicability.termination = self._process(template.applicability.termination)
-
-        # extraction
-        template.product.description = self._process(template.product.description)
-        template.product.product = self._process(template.product.product)
-        template.product.typology = self._process(template.product.typology)
-
-        # extraction
-        template.insurer.name = self._process(template.insurer.name)
-        template.insurer.siren = [self._process(x) for x in template.insurer.siren]
+        # flatten all texts to clean them in one pass
+        texts = []
+        for field in self.fields:
+            if field.profile == "list":
+                texts.extend(template.items(field.name))
+            else:
+                texts.append(template.text(field.name))
+        cleaned = iter(self.clean_many(texts))
+
+        for field in self.fields:
+            if field.profile == "list":
+                template.set(field.name, [next(cleaned) for _ in template.items(field.name)])
+            else:
+                template.set(field.name, next(cleaned))
 
         return template
 
+    def clean_many(self, texts: List[str]) -> List[str]:
+        """Clean all `texts` in a single pass of the cleanup engine, by joining them
+        with a separator that no cleanup step can alter.
+        """
+        if not texts:
+            return []
+        if any(BATCH_SEPARATOR in text for text in texts):
+            return [self._process(text) for text in texts]
+        cleaned = self._process(BATCH_SEPARATOR.join(texts)).split(BATCH_SEPARATOR)
+        return [text.strip() for text in cleaned]
+
     @staticmethod
     def _process(text: str) -> str:
         # clean punctuation
-        text = re.sub(r"[\?!✓\uf0fb]+", " - ", text)
-        text = re.sub(r":", " ",text)
-        text = re.sub(r"[\s\t]+", " ", text)
-
-        # remove new line characters that should not be considered as new lines
-        text = re.sub(regex_not_new_line, r"\2", text)
-        text = re.sub(r"[\s\t]+", " ", text)
-
-        text = re.sub(r"-+", " \n- ", text)
-        text = re.sub(r"(\n-)([\s\t]*\n-)", r"\1", text)
-        text = re.sub(r"[\s\t]+", " ", text)
-        
-        return text.strip()
+        text = regex_bullet.sub(" - ", text.replace(":", " "))
+        text = " ".join(text.split())
+
+        # new line characters are all collapsed above, so there are no new lines left to
+        # join back: each run of dashes (two at most, when only separated by a space)
+        # becomes a list item
+        text = regex_dash.sub(" - ", text)
+
+        return " ".join(text.split())
@@ -1,15 +1,55 @@
-from fitz import Document
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+import fitz
+from fitz import Document, Page
+
+from .layout import layout_text
+
+# size of the MuPDF store (cached fonts, images and parsed objects) kept between documents, in bytes
+DEFAULT_STORE_SIZE = 64 * 1024 * 1024
 
 
 def read_pdf(path) -> Document:
+    """Open a pdf from its content (bytes) or from its path. A path is read by MuPDF
+    on demand, without loading the whole file in memory.
+    """
     try:
-        pdf = Document(stream=path, filetype="pdf")
+        if isinstance(path, (bytes, bytearray)):
+            pdf = Document(stream=path, filetype="pdf")
+        else:
+            pdf = Document(path, filetype="pdf")
         assert pdf.is_pdf
     except (AssertionError, RuntimeError):
         raise
     return pdf
 
 
+@contextmanager
+def open_pdf(path, store_size: Optional[int] = DEFAULT_STORE_SIZE) -> Iterator[Document]:
+    """Open a pdf as `read_pdf`, and close it when leaving the context, so that its pages
+    and MuPDF buffers are released at once rather than when garbage collected. The MuPDF
+    store, shared by all the documents of the process, is then emptied if it holds more
+    than `store_size` bytes (never if None).
+    """
+    pdf = read_pdf(path)
+    try:
+        yield pdf
+    finally:
+        pdf.close()
+        if store_size is not None and fitz.TOOLS.store_size > store_size:
+            fitz.TOOLS.store_shrink(100)
+
+
+def read_text(page: Page, layout: bool = False) -> str:
+    """Extract the text of `page`, in the order of the pdf content or, with `layout`,
+    column by column.
+    """
+    if layout:
+        return layout_text(page)
+    return page.get_text("text")
+
+
 def get_pdf_metadata(pdf: Document) -> dict:
     metadata = {
         "year": "None"
@@ -0,0 +1,139 @@
+import re
+from typing import Dict, Iterable, List, NamedTuple, Optional, Pattern
+
+
+class Boundary(NamedTuple):
+    section: str
+    start: int
+    end: int
+
+
+class Span(NamedTuple):
+    header: Boundary
+    start: int
+    end: int
+    closed: bool  # followed by the header of another section
+
+
+class Chunk(NamedTuple):
+    section: str
+    text: str
+    start: int  # offset in the text of the whole document (all pages fed so far)
+    header: str  # header of the section, as matched
+
+
+class Segmenter:
+    """Split a text into sections with a single regex scan.
+
+    All section headers are merged into one alternation of named groups, so
+    a page is scanned once and every section is then sliced from the resulting
+    boundary index instead of being searched for separately.
+    """
+
+    def __init__(self, regex_field: Dict[str, Pattern]):
+        self.sections = list(regex_field)
+        self.regex = re.compile(
+            "|".join(f"(?P<{name}>{regex.pattern})" for name, regex in regex_field.items()),
+            re.IGNORECASE
+        )
+
+    def segment(self, text: str) -> List[Boundary]:
+        """Return the ordered list of section headers found in `text`.
+        """
+        return [Boundary(match.lastgroup, match.start(), match.end()) for match in self.regex.finditer(text)]
+
+    def locate(self, text: str, boundaries: Optional[List[Boundary]] = None,
+               sections: Optional[Iterable[str]] = None) -> Dict[str, Optional[Span]]:
+        """Locate the paragraph following each section header of `sections` (all sections
+        by default). A paragraph starts after the first occurrence of its header and stops
+        at the next header of any other section (it is then closed), or at the end of `text`.
+        Sections whose header is not found are mapped to None.
+        """
+        if boundaries is None:
+            boundaries = self.segment(text)
+        if sections is None:
+            sections = self.sections
+
+        # index of the first occurrence of each section header
+        first = {}
+        for i, boundary in enumerate(boundaries):
+            first.setdefault(boundary.section, i)
+
+        output = {}
+        for section in sections:
+            i = first.get(section)
+            if i is None:
+                output[section] = None
+                continue
+
+            header = boundaries[i]
+            output[section] = Span(header, header.end, len(text), False)
+            for boundary in boundaries[i + 1:]:
+                if boundary.section != section and boundary.start > header.end:
+                    output[section] = Span(header, header.end, boundary.start, True)
+                    break
+
+        return output
+
+    def extract(self, text: str, boundaries: Optional[List[Boundary]] = None,
+                sections: Optional[Iterable[str]] = None) -> Dict[str, str]:
+        """Extract the paragraph following each section header of `sections`, as located
+        by `locate`. Sections whose header is not found are mapped to an empty string.
+        """
+        spans = self.locate(text, boundaries, sections)
+        return {section: text[span.start:span.end] if span else "" for section, span in spans.items()}
+
+
+class SectionStream:
+    """Assemble sections over a sequence of page texts.
+
+    Each chunk of text is attributed to the last section header seen before it, even
+    when that header is on a previous page. Only the last `carry` characters of a page
+    are held back, so that a header split by a page break is still detected: memory
+    does not grow with the size of the document.
+    """
+
+    def __init__(self, segmenter: Segmenter, carry: int = 128):
+        self.segmenter = segmenter
+        self.carry = carry
+        self.section = None  # currently open section
+        self.header = ""  # header of the open section, as matched
+        self.pending = ""  # carry-over buffer, not yet attributed
+        self.offset = 0  # offset of the carry-over buffer in the text of the whole document
+        self.closed = set()  # sections followed by another section header
+
+    def feed(self, text: str) -> List[Chunk]:
+        """Consume the text of the next page, and return the chunks of text that can be
+        attributed to a section so far.
+        """
+        return self._consume(self.pending + text, self.carry)
+
+    def close(self) -> List[Chunk]:
+        """Flush the carry-over buffer at the end of the document.
+        """
+        return self._consume(self.pending, 0)
+
+    def _consume(self, text: str, carry: int) -> List[Chunk]:
+        cut = max(len(text) - carry, 0)
+
+        chunks = []
+        position = 0
+        for boundary in self.segmenter.segment(text):
+            if boundary.start >= cut:
+                break  # might be completed by the next page
+            if boundary.section == self.section:
+                continue  # repeated header, keep it in the section text
+            if self.section is not None:
+                chunks.append(Chunk(self.section, text[position:boundary.start], self.offset + position, self.header))
+                self.closed.add(self.section)
+            self.section = boundary.section
+            self.header = text[boundary.start:boundary.end]
+            position = boundary.end
+
+        hold = max(cut, position)
+        if self.section is not None:
+            chunks.append(Chunk(self.section, text[position:hold], self.offset + position, self.header))
+        self.pending = text[hold:]
+        self.offset += hold
+
+        return [chunk for chunk in chunks if chunk.text]
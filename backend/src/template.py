@@ -1,4 +1,4 @@
-from typing import List
+from typing import Dict, List, Optional
 
 from pydantic import BaseModel, validator
 
@@ -11,11 +11,13 @@ class Insurer(BaseModel):
     def type_check_name(cls, v):
         if not isinstance(v, str):
             raise TypeError('must be string')
+        return v
 
     @validator('siren')
     def type_check_siren(cls, v):
         if not isinstance(v, List):
             raise TypeError('must be list')
+        return v
 
 
 class Product(BaseModel):
@@ -27,6 +29,7 @@ class Product(BaseModel):
     def type_check(cls, v):
         if not isinstance(v, str):
             raise TypeError('must be string')
+        return v
 
 
 class Coverage(BaseModel):
@@ -40,6 +43,7 @@ class Coverage(BaseModel):
     def type_check(cls, v):
         if not isinstance(v, str):
             raise TypeError('must be string')
+        return v
 
 
 class Applicability(BaseModel):
@@ -53,6 +57,30 @@ class Applicability(BaseModel):
     def type_check(cls, v):
         if not isinstance(v, str):
             raise TypeError('must be string')
+        return v
+
+
+class Metadata(BaseModel):
+    pages: int = 0  # pages in the document
+    pages_processed: int = 0  # pages whose text was extracted
+    size: int = 0  # size of the pdf file, in bytes
+    is_ipid: bool = True  # false if rejected by the pre-classifier, the document is then not parsed
+    confidence: Optional[float] = None  # confidence of the pre-classifier that the document is an IPID
+    timings: Dict[str, float] = {}  # seconds spent in each stage of the pipeline
+    field_timings: Dict[str, float] = {}  # seconds spent by the parser on sections and each other field
+    cached: bool = False  # result served from the cache, timings are then those of the original parse
+
+
+class Source(BaseModel):
+    page: int  # index of the page, from 0
+    start: int  # span of the field in the text of the page, as extracted (before post-processing)
+    end: int
+
+
+class Provenance(BaseModel):
+    sources: List[Source] = []  # where the field was found, in page order
+    header: Optional[str] = None  # section header starting the field, as matched
+    confidence: float = 0.0  # between 0 and 1, from the way the field was found
 
 
 class Ipid(BaseModel):
@@ -60,3 +88,87 @@ class Ipid(BaseModel):
     product: Product = Product()
     coverage: Coverage = Coverage()
     applicability: Applicability = Applicability()
+    metadata: Metadata = Metadata()
+    provenance: Optional[Dict[str, Provenance]] = None  # by field name, only if requested
+
+
+class IpidBuilder:
+    """Accumulator of the fields of an `Ipid`, used while parsing and post-processing
+    a document. Text is kept as lists of chunks, joined once when read, and the
+    pydantic model is built and validated once, by `to_ipid`.
+    """
+    __slots__ = ("chunks", "resolved", "metadata", "provenance")
+
+    def __init__(self, provenance: bool = False):
+        self.chunks = {}  # field name -> chunks of text, or items of a list field
+        self.resolved = set()  # fields which cannot change on later pages
+        self.metadata = {}
+        self.provenance = {} if provenance else None  # field name -> sources, header and confidence
+
+    def add_source(self, name: str, page: int, start: int, end: int, confidence: float,
+                   header: Optional[str] = None) -> None:
+        """Record that field `name` was found in span `start`-`end` of the text of `page`,
+        if provenance is recorded, extending the previous span if it ends at `start`. The
+        confidence of a field is the highest of its sources.
+        """
+        if self.provenance is None:
+            return
+        provenance = self.provenance.setdefault(name, {"sources": [], "header": header, "confidence": confidence})
+        sources = provenance["sources"]
+        if sources and sources[-1]["page"] == page and sources[-1]["end"] == start:
+            sources[-1]["end"] = end  # continues the previous span
+        else:
+            sources.append({"page": page, "start": start, "end": end})
+        provenance["confidence"] = max(provenance["confidence"], confidence)
+
+    def append(self, name: str, chunk: str) -> None:
+        self.chunks.setdefault(name, []).append(chunk)
+
+    def extend(self, name: str, items: List[str]) -> None:
+        self.chunks.setdefault(name, []).extend(items)
+
+    def text(self, name: str) -> str:
+        chunks = self.chunks.get(name)
+        if not chunks:
+            return ""
+        if len(chunks) > 1:
+            chunks[:] = ["".join(chunks)]
+        return chunks[0]
+
+    def items(self, name: str) -> List[str]:
+        return list(self.chunks.get(name, []))
+
+    def set(self, name: str, value) -> None:
+        """Replace the text of field `name`, or its items if `value` is a list.
+        """
+        self.chunks[name] = list(value) if isinstance(value, list) else [value]
+
+    def to_ipid(self) -> Ipid:
+        groups = {"metadata": Metadata(**self.metadata)}
+        if self.provenance is not None:
+            groups["provenance"] = self.provenance
+        for group, group_field in Ipid.__fields__.items():
+            if group in ("metadata", "provenance"):
+                continue
+            values = {}
+            for name, field in group_field.type_.__fields__.items():
+                if name in self.chunks:
+                    values[name] = self.items(name) if isinstance(field.default, list) else self.text(name)
+            groups[group] = group_field.type_(**values)
+        return Ipid(**groups)
+
+
+class BatchResult(BaseModel):
+    filename: str
+    ipid: Optional[Ipid] = None
+    error: Optional[str] = None
+
+
+class Job(BaseModel):
+    id: str
+    status: str  # "pending", "running", "done" or "failed"
+    filename: str = ""
+    created: float  # unix timestamps
+    updated: float
+    ipid: Optional[Ipid] = None
+    error: Optional[str] = None
@@ -0,0 +1,110 @@
+import hashlib
+import inspect
+import json
+import os
+import sqlite3
+import zlib
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+import fitz
+
+from . import layout, reader, word_recovery
+
+
+def extraction_version() -> str:
+    """Version stamp of text extraction. It changes with the code of the reader, the layout
+    mode and word recovery, or with the version of MuPDF, which invalidates stored texts.
+    """
+    digest = hashlib.sha256(fitz.VersionBind.encode())
+    for module in (reader, layout, word_recovery):
+        digest.update(inspect.getsource(module).encode())
+    return digest.hexdigest()[:12]
+
+
+EXTRACTION_VERSION = extraction_version()
+
+
+class StoredDocument(NamedTuple):
+    page_count: int
+    size: int  # size of the pdf file, in bytes
+    metadata: dict  # pdf metadata, see `reader.get_pdf_metadata`
+    texts: List[str]  # text of the first pages, or of all of them
+
+    def covers(self, max_pages: Optional[int] = None) -> bool:
+        """Whether the stored texts are enough to parse the document, up to `max_pages`."""
+        return len(self.texts) == self.page_count or (max_pages is not None and len(self.texts) >= max_pages)
+
+
+class TextStore:
+    """Text of the pages of parsed documents, compressed in a SQLite file and keyed by the
+    sha256 of the document and the extraction mode, so that documents can be parsed again
+    with new extraction rules without being read again.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.db = sqlite3.connect(path, timeout=30)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("CREATE TABLE IF NOT EXISTS pages (digest TEXT NOT NULL, layout INTEGER NOT NULL, "
+                        "version TEXT NOT NULL, page_count INTEGER NOT NULL, size INTEGER NOT NULL, "
+                        "metadata TEXT NOT NULL, texts BLOB NOT NULL, stored INTEGER NOT NULL, "
+                        "PRIMARY KEY (digest, layout))")
+        columns = {row[1] for row in self.db.execute("PRAGMA table_info(pages)")}
+        if "stored" not in columns:  # files created before the number of stored pages was recorded
+            self.db.execute("ALTER TABLE pages ADD COLUMN stored INTEGER NOT NULL DEFAULT 0")
+            for digest, layout, texts in self.db.execute("SELECT digest, layout, texts FROM pages").fetchall():
+                self.db.execute("UPDATE pages SET stored = ? WHERE digest = ? AND layout = ?",
+                                (len(json.loads(zlib.decompress(texts))), digest, layout))
+        self.db.commit()
+
+    def get(self, digest: str, layout: bool = False) -> Optional[StoredDocument]:
+        """Stored texts of a document, or None if missing or extracted by another version."""
+        row = self.db.execute("SELECT page_count, size, metadata, texts FROM pages WHERE digest = ? AND layout = ? "
+                              "AND version = ?", (digest, layout, EXTRACTION_VERSION)).fetchone()
+        if row is None:
+            return None
+        page_count, size, metadata, texts = row
+        return StoredDocument(page_count, size, json.loads(metadata), json.loads(zlib.decompress(texts)))
+
+    def save(self, digest: str, document: StoredDocument, layout: bool = False) -> None:
+        """Store the texts of a document, unless more of its pages are already stored."""
+        stored = self.get(digest, layout)
+        if stored is not None and len(stored.texts) >= len(document.texts):
+            return
+        texts = zlib.compress(json.dumps(document.texts, ensure_ascii=False).encode(), 6)
+        self.db.execute("INSERT OR REPLACE INTO pages (digest, layout, version, page_count, size, metadata, texts, "
+                        "stored) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                        (digest, layout, EXTRACTION_VERSION, document.page_count, document.size,
+                         json.dumps(document.metadata), texts, len(document.texts)))
+        self.db.commit()
+
+    def digests(self, layout: bool = False, max_pages: Optional[int] = None, partial: bool = False) -> Iterator[str]:
+        """Hashes of the documents stored by the current extraction version, whose texts are
+        enough to parse them up to `max_pages` (see `StoredDocument.covers`) or, if `partial`,
+        are not: only their first pages were extracted (early exit, or not an IPID).
+        """
+        covers = "(stored = page_count OR (? IS NOT NULL AND stored >= ?))"
+        query = (f"SELECT digest FROM pages WHERE layout = ? AND version = ? AND {'NOT ' if partial else ''}{covers} "
+                 "ORDER BY digest")
+        for digest, in self.db.execute(query, (layout, EXTRACTION_VERSION, max_pages, max_pages)).fetchall():
+            yield digest
+
+    def purge(self) -> int:
+        """Delete the texts extracted by other versions, and return their number."""
+        count = self.db.execute("DELETE FROM pages WHERE version != ?", (EXTRACTION_VERSION,)).rowcount
+        self.db.commit()
+        return count
+
+
+# stores opened by the current process, by path
+stores: Dict[Tuple[str, int], TextStore] = {}
+
+
+def open_text_store(path: str) -> TextStore:
+    """Store at `path`, opened once per process (connections are not shared with forked
+    worker processes).
+    """
+    key = (path, os.getpid())
+    if key not in stores:
+        stores[key] = TextStore(path)
+    return stores[key]
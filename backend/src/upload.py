@@ -0,0 +1,35 @@
+import hashlib
+import os
+import tempfile
+from typing import Optional, Tuple
+
+CHUNK_SIZE = 1 << 20  # 1 MiB
+
+
+class UploadTooLargeError(Exception):
+    """Raised when an uploaded file exceeds the maximum upload size."""
+
+
+async def spool_upload(file, max_size: int, directory: Optional[str] = None) -> Tuple[str, str]:
+    """Copy an uploaded `file` to a temporary pdf file, chunk by chunk, and return its
+    path along with the sha256 digest of its content. The caller is responsible for
+    removing the file. Raise `UploadTooLargeError` as soon as `max_size` bytes are exceeded.
+    """
+    digest = hashlib.sha256()
+    size = 0
+    fd, path = tempfile.mkstemp(suffix=".pdf", dir=directory)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            while True:
+                chunk = await file.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > max_size:
+                    raise UploadTooLargeError(f"file exceeds the maximum upload size of {max_size} bytes")
+                digest.update(chunk)
+                f.write(chunk)
+    except BaseException:
+        os.remove(path)
+        raise
+    return path, digest.hexdigest()
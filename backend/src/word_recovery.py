@@ -1,6 +1,9 @@
+import re
 from itertools import groupby
 from operator import itemgetter
+from typing import Iterable, List, Pattern, Tuple, Union
 
+import numpy as np
 from fitz import Rect
 
 
@@ -103,10 +106,154 @@ class WordRecovery:
         return words_out
 
 
+def word_arrays(words: list) -> Tuple[np.ndarray, np.ndarray]:
+    """Split `words` (items starting with x0, y0, x1, y1, "word") into an (N, 4) float
+    array of word boxes and an array of word strings.
+    """
+    boxes = np.array([w[:4] for w in words], dtype=float).reshape(-1, 4)
+    strings = np.array([w[4] for w in words], dtype=object)
+    return boxes, strings
+
+
+class VectorizedWordRecovery(WordRecovery):
+    """Same output as `WordRecovery`, but words are held in NumPy arrays, and containment,
+    sorting, line grouping and merging are computed on whole arrays instead of building
+    a `Rect` for each word, several times.
+    """
+
+    @staticmethod
+    def get_new_word_lines(words: list) -> list:
+        if len(words) == 0:
+            return []
+
+        # sort words by y coordinates, and start a new line each time it changes
+        y1 = np.array([w[3] for w in words], dtype=float)
+        order = np.argsort(y1, kind="stable")
+        y1 = y1[order]
+        lines = np.zeros(len(words), dtype=int)
+        lines[1:] = np.cumsum(y1[1:] != y1[:-1])
+
+        return [words[i] + [line] for i, line in zip(order.tolist(), lines.tolist())]
+
+    @staticmethod
+    def order_words(words: list, rect: Rect) -> list:
+        if len(words) == 0:
+            return []
+        boxes, strings = word_arrays(words)
+
+        # keep words contained in given rectangle
+        x0, y0, x1, y1 = boxes.T
+        inside = ((rect.x0 <= x0) & (x0 <= x1) & (x1 <= rect.x1)
+                  & (rect.y0 <= y0) & (y0 <= y1) & (y1 <= rect.y1))
+
+        # sort the words by lower line, then by word start coordinate
+        order = np.flatnonzero(inside)
+        order = order[np.lexsort((x0[order], y1[order]))]
+        x0, y0, x1, y1, strings = x0[order], y0[order], x1[order], y1[order], strings[order]
+        if len(order) == 0:
+            return []
+
+        # join a word with the previous one if they are on the same line, and closer than
+        # 20% of the width of one letter
+        lengths = np.array([len(word) for word in strings], dtype=float)
+        threshold = np.where(x1 > x0, x1 - x0, 0) / lengths / 5
+        joined = np.zeros(len(order), dtype=bool)
+        joined[1:] = (y1[1:] == y1[:-1]) & (x0[1:] <= x1[:-1] + threshold[1:])
+
+        # each word starts a group of joined pieces
+        starts = np.flatnonzero(~joined)
+        ends = np.append(starts[1:], len(order))
+        top = np.maximum.reduceat(y0, starts)
+
+        strings = strings.tolist()
+        return [
+            [x0_, y0_, x1_, y1_, "".join(strings[start:end])]
+            for x0_, y0_, x1_, y1_, start, end in zip(
+                x0[starts].tolist(), top.tolist(), x1[ends - 1].tolist(), y1[starts].tolist(),
+                starts.tolist(), ends.tolist())
+        ]
+
+
+class PageIndex:
+    """Search index over the recovered words of a page, built once and queried many times.
+
+    Words are concatenated into the text of the page (words separated by a space, lines
+    by a new line), along with the offset of each word in that text, so that a regex
+    search over the text can be mapped back to word boxes. Word boxes are also bucketed
+    in a grid of `cell_size` points, to look up the words in an area of the page.
+    """
+
+    def __init__(self, words: list, cell_size: float = 50.0):
+        """`words` are items of the following format, as returned by `WordRecovery`:
+        [x0, y0, x1, y1, "word", line]
+        """
+        self.words = sorted(words, key=itemgetter(5, 0))  # by line, then from left to right
+        self.boxes, strings = word_arrays(self.words)
+        self.lines = np.array([w[5] for w in self.words], dtype=int)
+
+        # concatenated text, and [start, end) offsets of each word in it
+        pieces, starts, ends = [], [], []
+        position = 0
+        for i, (word, line) in enumerate(zip(strings.tolist(), self.lines.tolist())):
+            if i > 0:
+                pieces.append(" " if line == self.lines[i - 1] else "\n")
+                position += 1
+            pieces.append(word)
+            starts.append(position)
+            position += len(word)
+            ends.append(position)
+        self.text = "".join(pieces)
+        self.starts = np.array(starts, dtype=int)
+        self.ends = np.array(ends, dtype=int)
+
+        # grid of word indices
+        self.cell_size = cell_size
+        self.grid = {}
+        cells = np.floor(self.boxes / cell_size).astype(int)
+        for i, (cx0, cy0, cx1, cy1) in enumerate(cells.tolist()):
+            for cx in range(cx0, cx1 + 1):
+                for cy in range(cy0, cy1 + 1):
+                    self.grid.setdefault((cx, cy), []).append(i)
+
+    def search(self, pattern: Union[str, Pattern], flags: int = re.IGNORECASE) -> List[List[Rect]]:
+        """Search for regex `pattern` in the text of the page. Return a list of rectangles
+        for each match: one rectangle per line spanned by the matched words.
+        """
+        output = []
+        for match in re.finditer(pattern, self.text, flags=flags if isinstance(pattern, str) else 0):
+            first = np.searchsorted(self.ends, match.start(), side="right")  # first word ending after start
+            last = np.searchsorted(self.starts, match.end(), side="left") - 1  # last word starting before end
+            if first > last:
+                continue  # only matched separators
+            output.append(self.line_rects(range(first, last + 1)))
+        return output
+
+    def line_rects(self, indices: Iterable[int]) -> List[Rect]:
+        """Merge the boxes of words `indices` into one rectangle per line.
+        """
+        rects = {}
+        for i in indices:
+            rect = Rect(self.boxes[i])
+            line = self.lines[i]
+            rects[line] = rects[line] | rect if line in rects else rect
+        return list(rects.values())
+
+    def words_in(self, rect: Rect) -> list:
+        """Return the words whose box intersects `rect`.
+        """
+        cx0, cy0, cx1, cy1 = (int(np.floor(v / self.cell_size)) for v in rect)
+        candidates = sorted({i for cx in range(cx0, cx1 + 1) for cy in range(cy0, cy1 + 1)
+                             for i in self.grid.get((cx, cy), [])})
+        if not candidates:
+            return []
+        x0, y0, x1, y1 = self.boxes[candidates].T
+        hit = (x0 < rect.x1) & (x1 > rect.x0) & (y0 < rect.y1) & (y1 > rect.y0)
+        return [self.words[i] for i, h in zip(candidates, hit.tolist()) if h]
+
+
 def search_for(text: str, words: list) -> list:
-    """ Search for text in items of list of words.
-    TODO: add regular expressions.
-    TODO: currently, words is a list of words, check if it could be entire text and how to derive bounding box
+    """ Search for text in items of list of words. To search for regular expressions,
+    or for text spanning several words, use `PageIndex`.
 
     Args:
         text: string to be searched for 
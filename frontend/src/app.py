@@ -1,22 +1,41 @@
 import os
+from collections import OrderedDict
 
 import requests
 import streamlit as st
 from dotenv import load_dotenv
+from requests.adapters import HTTPAdapter
 
 from session_state import SessionState
-from utils import display_pdf
+from utils import display_pdf, display_thumbnails, file_hash, open_pdf, pdf_html, remember
 
 # load env variables from .env from specified path
 DOTENV_PATH = os.environ.get('DOTENV_PATH', './.env')
 load_dotenv(dotenv_path=DOTENV_PATH, verbose=True)
 PORT = int(os.environ.get('PORT'))
 
+# backend requests: connection and read timeouts, in seconds
+CONNECT_TIMEOUT = float(os.environ.get('CONNECT_TIMEOUT', 3))
+READ_TIMEOUT = float(os.environ.get('READ_TIMEOUT', 120))
+
+# documents whose prediction and preview are kept per session
+SESSION_CACHE_SIZE = int(os.environ.get('SESSION_CACHE_SIZE', 8))
+
+# preview: "thumbnails" of a few pages at a time, rendered on demand, or the whole pdf "embed"ded
+PREVIEW_MODE = os.environ.get('PREVIEW_MODE', 'thumbnails')
+PREVIEW_PAGES = int(os.environ.get('PREVIEW_PAGES', 4))  # pages per view
+PREVIEW_ZOOM = float(os.environ.get('PREVIEW_ZOOM', 0.5))  # 1 is 72 dpi
+PREVIEW_CACHE_SIZE = int(os.environ.get('PREVIEW_CACHE_SIZE', 64))  # thumbnails kept per session
+
+# connections to the backend are pooled and reused across reruns
+http = requests.Session()
+http.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=10))
+
 
 def predict(file):
-    #response = requests.post(f'http://localhost:{PORT}/file', files=file)
-    response = requests.post(f'http://localhost:{PORT}/file', files={"file": file})
-    print(response)
+    response = http.post(f'http://localhost:{PORT}/file', files={"file": file},
+                         timeout=(CONNECT_TIMEOUT, READ_TIMEOUT))
+    response.raise_for_status()
     response_json = response.json()
     return response_json
 
@@ -35,14 +54,34 @@ def main():
     st.write("Drag and drop any IPID document, and get a structured information.")
     uploaded_file = st.sidebar.file_uploader(label="Upload IPID document (pdf only)", type=["pdf"])
 
-    session_state = SessionState.get(predict_button=False)
+    session_state = SessionState.get(predict_button=False, digest=None, document=None, predictions=OrderedDict(),
+                                     previews=OrderedDict(), thumbnails=OrderedDict())
 
     if not uploaded_file:
         st.warning("Please upload an IPID document.")
         st.stop()
     else:
         session_state.uploaded_file = uploaded_file
-        display_pdf(session_state.uploaded_file.read())  # display pdf
+        content = session_state.uploaded_file.getvalue()
+        digest = file_hash(content)
+        if digest != session_state.digest:  # new document
+            session_state.digest = digest
+            session_state.predict_button = False
+            session_state.document = open_pdf(content) if PREVIEW_MODE == "thumbnails" else None
+
+        if PREVIEW_MODE == "thumbnails":
+            # display a few pages, rendered when first displayed
+            document = session_state.document
+            views = -(-document.page_count // PREVIEW_PAGES)
+            view = st.number_input(f"Pages ({document.page_count} in total)", min_value=1, max_value=views,
+                                   value=1, step=1) if views > 1 else 1
+            display_thumbnails(document, digest, session_state.thumbnails, first=(view - 1) * PREVIEW_PAGES,
+                               count=PREVIEW_PAGES, zoom=PREVIEW_ZOOM, cache_size=PREVIEW_CACHE_SIZE)
+        else:
+            # display pdf, encoded once per document
+            html = session_state.previews.get(digest) or remember(
+                session_state.previews, digest, pdf_html(content), size=SESSION_CACHE_SIZE)
+            display_pdf(content, html=html)
         predict_button = st.button("Parse document")  # display "parse document" button
 
 
@@ -52,7 +91,15 @@ def main():
 
     # if the user pressed the predict button
     if session_state.predict_button:
-        prediction = predict(session_state.uploaded_file.getvalue())
+        # the document is sent to the backend once, later reruns reuse the prediction
+        prediction = session_state.predictions.get(digest)
+        if prediction is None:
+            try:
+                prediction = predict(content)
+            except requests.RequestException as e:
+                st.error(f"The document could not be parsed: {e}")
+                st.stop()
+            remember(session_state.predictions, digest, prediction, size=SESSION_CACHE_SIZE)
         st.write("Here's what we extracted:")
         st.write(prediction)
 
@@ -1,11 +1,67 @@
 import base64
+import hashlib
+from collections import OrderedDict
 
+import fitz
 import streamlit as st
 
 
-def display_pdf(uploaded_document):
-    """Display a PDF in a streamlit application.
+def file_hash(content: bytes) -> str:
+    """sha256 digest of an uploaded file, used as cache key.
+    """
+    return hashlib.sha256(content).hexdigest()
+
+
+def remember(cache: OrderedDict, key, value, size: int = 8):
+    """Add `value` to the per-session `cache`, evicting the least recently added entries
+    beyond `size`, and return it.
+    """
+    cache[key] = value
+    cache.move_to_end(key)
+    while len(cache) > size:
+        cache.popitem(last=False)
+    return value
+
+
+def pdf_html(uploaded_document) -> str:
+    """HTML embedding a PDF, as a base64 data URI.
     """
     base64_pdf = base64.b64encode(uploaded_document).decode('utf-8')
-    pdf_display = f'<embed src="data:application/pdf;base64,{base64_pdf}" width="100%" height="1000" type="application/pdf">' 
+    return f'<embed src="data:application/pdf;base64,{base64_pdf}" width="100%" height="1000" type="application/pdf">'
+
+
+def display_pdf(uploaded_document, html: str = None):
+    """Display a PDF in a streamlit application. `html` is the output of `pdf_html`, if
+    already computed.
+    """
+    pdf_display = html or pdf_html(uploaded_document)
     st.markdown(pdf_display, unsafe_allow_html=True)
+
+
+def open_pdf(uploaded_document) -> fitz.Document:
+    """Open a PDF from its content, to render its pages.
+    """
+    return fitz.open(stream=uploaded_document, filetype="pdf")
+
+
+def render_page(document: fitz.Document, page_number: int, zoom: float = 0.5) -> bytes:
+    """Render page `page_number` of `document` as a PNG thumbnail, scaled by `zoom`
+    (1 is 72 dpi).
+    """
+    pixmap = document[page_number].get_pixmap(matrix=fitz.Matrix(zoom, zoom), alpha=False)
+    return pixmap.tobytes("png")
+
+
+def display_thumbnails(document: fitz.Document, digest: str, cache: OrderedDict, first: int, count: int,
+                       zoom: float = 0.5, cache_size: int = 64):
+    """Display thumbnails of pages `first` to `first + count` (excluded) of `document`. Pages
+    are rendered when first displayed, and kept in the per-session `cache`, keyed by the
+    `digest` of the document, the page and the zoom.
+    """
+    images = []
+    for page_number in range(first, min(first + count, document.page_count)):
+        key = (digest, page_number, zoom)
+        image = cache.get(key) or remember(cache, key, render_page(document, page_number, zoom), size=cache_size)
+        images.append(image)
+    st.image(images, caption=[f"Page {first + i + 1}" for i in range(len(images))],
+             width=int(595 * zoom))